@@ -0,0 +1,188 @@
+import pandas as pd
+from aqi import SCALES
+from category_counts import CategoryCounts
+from leaderboard import leaders
+from quantiles import BAND_QUANTILES, SKETCH_POLLUTANTS, TILE_QUANTILES
+from rolling import ROLLING_POLLUTANTS, exceedance_threshold
+from weekday_profile import WeekdayHourProfile
+
+def create_avg_aqi_df(rollup, selection, period):
+    avg_aqi_df = rollup.resample(period, ["PM2.5", "PM10"], **selection)
+    avg_aqi_df = avg_aqi_df.reset_index()
+    avg_aqi_df.rename(columns={
+        "PM2.5": "avg_pm2_5",
+        "PM10": "avg_pm10"
+    }, inplace=True)
+    return avg_aqi_df
+
+def create_aqi_stats_df(df):
+    aqi_stats_df = aggregate_groups(df, "date_time", {
+        "PM2.5": ["min", "max", "mean"],
+        "PM10": ["min", "max", "mean"]
+    })
+    aqi_stats_df = aqi_stats_df.reset_index()
+    aqi_stats_df.rename(columns={
+        "PM2.5": "pm2_5_stats",
+        "PM10": "pm10_stats"
+    }, inplace=True)
+    return aqi_stats_df
+
+def create_monthly_per_year_avg_aqi_df(rollup, selection):
+    monthly_avg_aqi_df = rollup.resample('M', ["PM2.5", "PM10"], **selection)
+    monthly_avg_aqi_df.index = monthly_avg_aqi_df.index.strftime('%b')
+    monthly_avg_aqi_df = monthly_avg_aqi_df.reset_index()
+    monthly_avg_aqi_df.rename(columns={
+        "date_time": "month",
+        "PM2.5": "avg_pm2_5",
+        "PM10": "avg_pm10"
+    }, inplace=True)
+    return monthly_avg_aqi_df
+
+def create_avg_aqi_by_station_df(df):
+    avg_aqi_by_station_df = aggregate_groups(df, "station", {
+        "PM2.5": "mean",
+        "PM10": "mean"
+    }).rename(columns={
+        "PM2.5": "avg_pm2_5",
+        "PM10": "avg_pm10"
+    }).reset_index()
+    return avg_aqi_by_station_df
+
+def create_daily_avg_aqi_df(profile):
+    daily_avg_aqi_df = profile.weekday_means(["PM2.5", "PM10"]).reset_index()
+    daily_avg_aqi_df.rename(columns={
+        "PM2.5": "avg_pm2_5",
+        "PM10": "avg_pm10"
+    }, inplace=True)
+    return daily_avg_aqi_df
+
+def create_hourly_avg_aqi_df(profile):
+    hourly_avg_aqi_df = profile.hour_means(["PM2.5", "PM10"]).reset_index()
+    hourly_avg_aqi_df["hour"] = hourly_avg_aqi_df["hour"].astype(str) + ":00"
+    return hourly_avg_aqi_df
+
+def create_weekday_hour_df(profile, pollutant):
+    return profile.grid(pollutant)
+
+def create_aqi_by_pm2_5_df(df):
+    aqi_by_pm2_5_df = count_categories(df, "AQIBYPM2.5").reset_index()
+    aqi_by_pm2_5_df.rename(columns={
+        "idx": "aqi_by_pm2_5_count"
+    }, inplace=True)
+    categories = SCALES["PM2.5"].categories
+    aqi_by_pm2_5_df["AQIBYPM2.5"] = pd.Categorical(
+        aqi_by_pm2_5_df["AQIBYPM2.5"], categories=categories, ordered=True)
+    aqi_by_pm2_5_df.sort_values(by="AQIBYPM2.5").reset_index(drop=True)
+    return aqi_by_pm2_5_df
+
+def create_aqi_by_pm10_df(df):
+    aqi_by_pm10_df = count_categories(df, "AQIBYPM10").reset_index()
+    aqi_by_pm10_df.rename(columns={
+        "idx": "aqi_by_pm10_count"
+    }, inplace=True)
+    categories = SCALES["PM10"].categories
+    aqi_by_pm10_df["AQIBYPM10"] = pd.Categorical(
+        aqi_by_pm10_df["AQIBYPM10"], categories=categories, ordered=True)
+    aqi_by_pm10_df.sort_values(by="AQIBYPM10")
+    return aqi_by_pm10_df
+
+def create_rolling_aqi_df(rolling, selection, pollutant):
+    return rolling.series(pollutant, **selection).reset_index()
+
+def create_exceedance_df(rolling, selection):
+    """Peak 24-hour mean, hours whose 24-hour mean is above the AQI 100
+    breakpoint, and the last NowCast of the selection, per pollutant."""
+    rows = []
+    for pollutant in ROLLING_POLLUTANTS:
+        series = rolling.series(pollutant, **selection)
+        threshold = exceedance_threshold(pollutant)
+        nowcast = series.dropna(subset=["nowcast"])
+        rows.append({
+            "pollutant": pollutant,
+            "threshold": threshold,
+            "max_24h": series["rolling_24h"].max(),
+            "exceedance_hours": int((series["rolling_24h"] > threshold).sum()),
+            "nowcast": nowcast["nowcast"].iloc[-1] if len(nowcast) else float("nan"),
+            "nowcast_aqi": nowcast["nowcast_aqi"].iloc[-1] if len(nowcast) else float("nan"),
+        })
+    return pd.DataFrame(rows).set_index("pollutant")
+
+def create_percentile_df(sketches, selection):
+    percentile_df = pd.DataFrame({
+        pollutant: sketches.quantiles(pollutant, TILE_QUANTILES, **selection)
+        for pollutant in SKETCH_POLLUTANTS
+    }).T
+    percentile_df.columns = [f"p{quantile * 100:g}" for quantile in TILE_QUANTILES]
+    return percentile_df
+
+def create_percentile_band_df(sketches, selection, period):
+    bands = []
+    for pollutant, prefix in [("PM2.5", "pm2_5"), ("PM10", "pm10")]:
+        band = sketches.resample(period, pollutant, BAND_QUANTILES, **selection)
+        band.columns = [f"{prefix}_p{quantile * 100:g}" for quantile in BAND_QUANTILES]
+        bands.append(band)
+    return pd.concat(bands, axis=1).reset_index()
+
+def create_station_scores_df(leaderboard, selection, ranking):
+    """Score of every station for ``ranking`` on the selected dates; a
+    selected station is ranked among all of them, not filtered to."""
+    dates = {key: value for key, value in selection.items() if key != "station"}
+    return leaderboard.scores(ranking, **dates).to_frame()
+
+def create_leaderboard_df(scores_df, n):
+    return leaders(scores_df["score"], n)
+
+def create_correlation_df(covariance, selection):
+    return covariance.correlation(**selection)
+
+def create_weekday_hour_profile(source):
+    """Weekday x hour sums and counts of the rows, or the profile already
+    folded into a ``StreamingAggregates``."""
+    if isinstance(source, pd.DataFrame):
+        return WeekdayHourProfile.from_frame(source)
+    return source.profile
+
+def aggregate_groups(source, key, spec):
+    """``groupby(key).agg(spec)`` over the rows, or over the partial
+    aggregates of a ``StreamingAggregates`` standing in for them."""
+    if isinstance(source, pd.DataFrame):
+        return source.groupby(by=key, observed=True).agg(spec)
+    return source.group_agg(key, spec)
+
+def count_categories(source, column):
+    """Distinct ``idx`` per category, derived from the concentrations of the
+    rows or taken from precomputed ``CategoryCounts``/``StreamingAggregates``."""
+    if isinstance(source, pd.DataFrame):
+        source = CategoryCounts.from_frame(source, [column])
+    return source.nunique(column)
+
+def create_agg_df(rollup, selection, period, annual_periods):
+    agg_df = rollup.resample(period, ["PM2.5", "PM10", "SO2", "NO2", "CO"],
+                             **selection)
+    if period == "M" and len(annual_periods) < 2:
+        agg_df.index = agg_df.index.strftime('%b')
+    else:
+        agg_df.index = agg_df.index.strftime('%Y-%m-%d')
+    agg_df = agg_df.reset_index()
+    agg_df.rename(columns={
+        "PM2.5": "avg_pm2_5",
+        "PM10": "avg_pm10",
+        "SO2": "avg_so2",
+        "NO2": "avg_no2",
+        "CO": "avg_co"
+    }, inplace=True)
+    return agg_df
+
+def create_agg_stats_df(df):
+    agg_stats_df = aggregate_groups(df, "date_time", {
+        "SO2": "mean",
+        "NO2": "mean",
+        "CO": "mean"
+    })
+    agg_stats_df = agg_stats_df.reset_index()
+    agg_stats_df.rename(columns={
+        "SO2": "so2_stats",
+        "NO2": "no2_stats",
+        "CO": "co_stats"
+    }, inplace=True)
+    return agg_stats_df
@@ -0,0 +1,75 @@
+"""AQI categories and sub-indices computed from PM2.5/PM10 concentrations.
+
+Each scale is a table of US EPA breakpoint segments. A reading's segment is
+found with one ``searchsorted`` over the segment upper bounds, which gives
+both its category code and the linear interpolation for its sub-index.
+Category codes are int8 with -1 for missing readings, so category
+histograms are a single ``bincount``.
+"""
+import numpy as np
+
+
+class AqiScale:
+
+    def __init__(self, categories, segments):
+        self.categories = categories
+        segments = np.asarray(segments, dtype=float)
+        self.low, self.high, self.index_low, self.index_high = segments[:, :4].T
+        self.segment_codes = segments[:, 4].astype(np.int8)
+
+    def _segments(self, values):
+        segments = np.searchsorted(self.high, values, side="left")
+        return np.minimum(segments, len(self.high) - 1)
+
+    def codes(self, values):
+        """Category code of every reading, -1 where it is missing."""
+        values = np.asarray(values, dtype=float)
+        codes = self.segment_codes[self._segments(values)]
+        codes[np.isnan(values)] = -1
+        return codes
+
+    def sub_index(self, values):
+        """Numeric AQI of every reading, capped at the top of the scale."""
+        values = np.asarray(values, dtype=float)
+        segments = self._segments(values)
+        low, high = self.low[segments], self.high[segments]
+        index_low, index_high = self.index_low[segments], self.index_high[segments]
+        fraction = (np.clip(values, low, high) - low) / (high - low)
+        return np.round(index_low + fraction * (index_high - index_low))
+
+    def labels(self, codes):
+        labels = np.asarray(self.categories, dtype=object)[codes]
+        labels[codes < 0] = None
+        return labels
+
+
+# Segments are (low, high, index low, index high, category code). PM10 has no
+# "Unhealthy for Sensitive Groups" category on this dashboard, so that
+# segment keeps its index range but counts as "Unhealthy".
+SCALES = {
+    "PM2.5": AqiScale(
+        ["Good", "Moderate", "Unhealthy for Sensitive Groups", "Unhealthy",
+         "Very Unhealthy", "Hazardous"],
+        [(0.0, 12.0, 0, 50, 0),
+         (12.1, 35.4, 51, 100, 1),
+         (35.5, 55.4, 101, 150, 2),
+         (55.5, 150.4, 151, 200, 3),
+         (150.5, 250.4, 201, 300, 4),
+         (250.5, 350.4, 301, 400, 5),
+         (350.5, 500.4, 401, 500, 5)],
+    ),
+    "PM10": AqiScale(
+        ["Good", "Moderate", "Unhealthy", "Very Unhealthy", "Hazardous"],
+        [(0, 54, 0, 50, 0),
+         (55, 154, 51, 100, 1),
+         (155, 254, 101, 150, 2),
+         (255, 354, 151, 200, 2),
+         (355, 424, 201, 300, 3),
+         (425, 504, 301, 400, 4),
+         (505, 604, 401, 500, 4)],
+    ),
+}
+
+# Precomputed category columns of main_data.csv and the pollutant each
+# one is derived from.
+CATEGORY_COLUMNS = {"AQIBYPM2.5": "PM2.5", "AQIBYPM10": "PM10"}
@@ -0,0 +1,579 @@
+"""Headless benchmarks for the dashboard's data path.
+
+Generates a synthetic dataset shaped like main_data.csv, then times loading,
+index/rollup builds, every create_* aggregation and a full uncached rerun
+for a few sidebar selections. Run ``python benchmark.py --help`` for the
+available knobs; ``--json`` appends the results as JSON lines so runs can be
+compared over time.
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import loader
+import sql_backend
+from aqi import CATEGORY_COLUMNS, SCALES
+from analytics import (
+    create_avg_aqi_df,
+    create_aqi_stats_df,
+    create_rolling_aqi_df,
+    create_exceedance_df,
+    create_percentile_df,
+    create_station_scores_df,
+    create_leaderboard_df,
+    create_monthly_per_year_avg_aqi_df,
+    create_avg_aqi_by_station_df,
+    create_daily_avg_aqi_df,
+    create_hourly_avg_aqi_df,
+    create_weekday_hour_profile,
+    create_aqi_by_pm2_5_df,
+    create_aqi_by_pm10_df,
+    create_agg_df,
+    create_agg_stats_df,
+    create_correlation_df,
+)
+from catalog import DatasetCatalog
+from category_counts import CategoryCounts
+from column_store import read_store
+from correlation import CovarianceRollup
+from dataset_index import DatasetIndex
+from downsample import DEFAULT_MAX_POINTS, downsample_rows, finite_runs
+from leaderboard import LEADERBOARD_SIZE, RANKINGS, StationLeaderboard
+from quantiles import (
+    MIN_VALUE, RELATIVE_ACCURACY, SKETCH_POLLUTANTS, TILE_QUANTILES, QuantileSketches
+)
+from rolling import RollingAqi, nowcast, rolling_mean
+from rollup import DailyRollup
+
+POLLUTANT_SCALES = {"PM2.5": 80, "PM10": 100, "SO2": 15, "NO2": 50, "CO": 1200}
+PERIODS = ["D", "W", "M", "Q", "6M"]
+# Sessions share the loaded dataset, so each one should only add its own
+# widget state and small aggregates, not a copy of the rows it selects.
+MAX_SESSION_MIB = 5.0
+
+
+def generate_main_data(stations=12, years=4, start="2013-03-01", seed=0,
+                       missing=0.02):
+    """Synthetic hourly readings with the columns of main_data.csv."""
+    rng = np.random.default_rng(seed)
+    period_starts = pd.date_range(start, periods=years + 1, freq=pd.DateOffset(years=1))
+    times = pd.date_range(period_starts[0], period_starts[-1], freq="h", inclusive="left")
+    period_labels = np.array([
+        f"({period_start:%Y-%m-%d} - {period_end - pd.Timedelta(days=1):%Y-%m-%d})"
+        for period_start, period_end in zip(period_starts[:-1], period_starts[1:])
+    ])
+    period_codes = np.searchsorted(period_starts, times, side="right") - 1
+
+    n = len(times) * stations
+    df = pd.DataFrame({
+        "idx": np.tile(np.arange(1, len(times) + 1), stations),
+        "station": np.repeat([f"Station {i + 1:03d}" for i in range(stations)], len(times)),
+        "date_time": np.tile(times, stations),
+    })
+    for pollutant, scale in POLLUTANT_SCALES.items():
+        values = rng.gamma(2, scale / 2, n).round(1)
+        values[rng.random(n) < missing] = np.nan
+        df[pollutant] = values
+    df["hour"] = np.tile(times.hour, stations)
+    df["annually_period"] = np.tile(period_labels[period_codes], stations)
+    for column, pollutant in CATEGORY_COLUMNS.items():
+        scale = SCALES[pollutant]
+        df[column] = scale.labels(scale.codes(df[pollutant]))
+    return df
+
+
+def time_call(func, *args, repeat=5):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def summarize(name, timings, rows=None):
+    return {
+        "name": name,
+        "rows": rows,
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+    }
+
+
+def selections(catalog):
+    periods = catalog.annual_periods
+    first_day = catalog.min_date.normalize()
+    return {
+        "all": ({}, {}, ["", ""]),
+        "range": (
+            {"start": first_day, "end": first_day + pd.Timedelta(days=180)},
+            {"start": first_day, "end": first_day + pd.Timedelta(days=181)},
+            ["", ""],
+        ),
+        "annual": (
+            {"annual_periods": periods[:2]},
+            {"annual_periods": periods[:2]},
+            periods[:2],
+        ),
+        "station": ({"station": catalog.stations[0]},
+                    {"station": catalog.stations[0]}, ["", ""]),
+    }
+
+
+def page_aggregates(main_df, rollup, selection, annual_periods):
+    """Every aggregate one dashboard rerun needs, computed without caching."""
+    profile = create_weekday_hour_profile(main_df)
+    results = [
+        ("create_aqi_stats_df", create_aqi_stats_df(main_df)),
+        ("create_avg_aqi_by_station_df", create_avg_aqi_by_station_df(main_df)),
+        ("create_daily_avg_aqi_df", create_daily_avg_aqi_df(profile)),
+        ("create_hourly_avg_aqi_df", create_hourly_avg_aqi_df(profile)),
+        ("create_aqi_by_pm2_5_df", create_aqi_by_pm2_5_df(main_df)),
+        ("create_aqi_by_pm10_df", create_aqi_by_pm10_df(main_df)),
+        ("create_agg_stats_df", create_agg_stats_df(main_df)),
+        ("create_monthly_per_year_avg_aqi_df",
+         create_monthly_per_year_avg_aqi_df(rollup, selection)),
+    ]
+    for period in PERIODS:
+        results.append((f"create_avg_aqi_df[{period}]",
+                        create_avg_aqi_df(rollup, selection, period)))
+        if period != "D":
+            results.append((f"create_agg_df[{period}]",
+                            create_agg_df(rollup, selection, period, annual_periods)))
+    return results
+
+
+def rerun(data_index, rollup, selection, row_filter, annual_periods):
+    main_df = data_index.select(**row_filter)
+    return page_aggregates(main_df, rollup, selection, annual_periods)
+
+
+def run_benchmarks(stations, years, repeat, app=False):
+    results = []
+
+    def record(name, timings, rows=None):
+        results.append(summarize(name, timings, rows))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "main_data.csv")
+        generate_main_data(stations, years).to_csv(path, index=False)
+
+        timings, df = time_call(loader.read_source_csv, path, repeat=1)
+        record("load.csv", timings, len(df))
+        fingerprint = loader.source_fingerprint(path)
+        loader.write_columnar(df, loader.columnar_path(path), fingerprint)
+        timings, _ = time_call(loader.read_columnar, loader.columnar_path(path),
+                               fingerprint, repeat=repeat)
+        record("load.parquet", timings, len(df))
+        loader.write_column_store(path)
+        timings, _ = time_call(read_store, loader.store_path(path), fingerprint,
+                               loader.LAYOUT, repeat=repeat)
+        record("load.column_store", timings, len(df))
+
+        for name, build in [("build.catalog", DatasetCatalog.from_frame),
+                            ("build.dataset_index", DatasetIndex.from_frame),
+                            ("build.daily_rollup", DailyRollup.from_frame),
+                            ("build.rolling_aqi", RollingAqi.from_frame),
+                            ("build.covariance", CovarianceRollup.from_frame),
+                            ("build.quantile_sketches", QuantileSketches.from_frame)]:
+            timings, _ = time_call(build, df, repeat=repeat)
+            record(name, timings, len(df))
+        catalog = DatasetCatalog.from_frame(df)
+        data_index = DatasetIndex.from_frame(df)
+        rollup = DailyRollup.from_frame(df)
+        rolling = RollingAqi.from_frame(df)
+        covariance = CovarianceRollup.from_frame(df)
+        sketches = QuantileSketches.from_frame(df)
+        leaderboard = StationLeaderboard(rollup, sketches, rolling)
+        for name, compute in [("rolling_mean", rolling_mean), ("nowcast", nowcast)]:
+            timings, _ = time_call(compute, rolling.values["PM2.5"], repeat=repeat)
+            record(f"compute.{name}", timings, len(df))
+
+        for label, (selection, row_filter, annual_periods) in selections(catalog).items():
+            timings, main_df = time_call(lambda: data_index.select(**row_filter),
+                                         repeat=repeat)
+            record(f"{label}.filter", timings, len(main_df))
+            for create in [create_aqi_stats_df, create_avg_aqi_by_station_df,
+                           create_weekday_hour_profile, create_aqi_by_pm2_5_df,
+                           create_aqi_by_pm10_df, create_agg_stats_df]:
+                timings, _ = time_call(create, main_df, repeat=repeat)
+                record(f"{label}.{create.__name__}", timings, len(main_df))
+            profile = create_weekday_hour_profile(main_df)
+            for create in [create_daily_avg_aqi_df, create_hourly_avg_aqi_df]:
+                timings, _ = time_call(create, profile, repeat=repeat)
+                record(f"{label}.{create.__name__}", timings, len(main_df))
+            timings, _ = time_call(create_monthly_per_year_avg_aqi_df, rollup, selection,
+                                   repeat=repeat)
+            record(f"{label}.create_monthly_per_year_avg_aqi_df", timings, len(main_df))
+            timings, _ = time_call(create_exceedance_df, rolling, selection, repeat=repeat)
+            record(f"{label}.create_exceedance_df", timings, len(main_df))
+            timings, _ = time_call(create_rolling_aqi_df, rolling, selection, "PM2.5",
+                                   repeat=repeat)
+            record(f"{label}.create_rolling_aqi_df", timings, len(main_df))
+            timings, _ = time_call(create_percentile_df, sketches, selection, repeat=repeat)
+            record(f"{label}.create_percentile_df", timings, len(main_df))
+            for ranking in RANKINGS:
+                timings, scores_df = time_call(create_station_scores_df, leaderboard, selection,
+                                               ranking, repeat=repeat)
+                record(f"{label}.create_station_scores_df[{ranking}]", timings, len(main_df))
+            timings, _ = time_call(create_leaderboard_df, scores_df, LEADERBOARD_SIZE,
+                                   repeat=repeat)
+            record(f"{label}.create_leaderboard_df", timings, len(main_df))
+            timings, _ = time_call(create_correlation_df, covariance, selection, repeat=repeat)
+            record(f"{label}.create_correlation_df", timings, len(main_df))
+            for period in PERIODS:
+                timings, _ = time_call(create_avg_aqi_df, rollup, selection, period,
+                                       repeat=repeat)
+                record(f"{label}.create_avg_aqi_df[{period}]", timings, len(main_df))
+                timings, _ = time_call(create_agg_df, rollup, selection, period,
+                                       annual_periods, repeat=repeat)
+                record(f"{label}.create_agg_df[{period}]", timings, len(main_df))
+            timings, _ = time_call(rerun, data_index, rollup, selection, row_filter,
+                                   annual_periods, repeat=repeat)
+            record(f"{label}.rerun", timings, len(main_df))
+
+        if app:
+            results.extend(run_app(directory, repeat))
+    return results
+
+
+def run_parity(stations, years):
+    """Compare every page aggregate of the pandas path with the SQL backend.
+
+    Returns one ``(selection, aggregate, error)`` row per aggregate, where
+    ``error`` is None when both backends agree.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "main_data.csv")
+        generate_main_data(stations, years).to_csv(path, index=False)
+        df = loader.read_source_csv(path)
+        catalog = DatasetCatalog.from_frame(df)
+        data_index = DatasetIndex.from_frame(df)
+        rollup = DailyRollup.from_frame(df)
+        backend = sql_backend.load_backend(path)
+
+        error = None if vars(backend.catalog) == vars(catalog) else "catalogs differ"
+        rows.append(("all", "catalog", error))
+        for label, (selection, row_filter, annual_periods) in selections(catalog).items():
+            expected = page_aggregates(data_index.select(**row_filter), rollup, selection,
+                                       annual_periods)
+            actual = page_aggregates(backend.select(**row_filter), backend, selection,
+                                     annual_periods)
+            for (name, left), (_, right) in zip(expected, actual):
+                try:
+                    pd.testing.assert_frame_equal(
+                        left, right, check_dtype=False, check_index_type=False,
+                        check_exact=False, rtol=1e-9)
+                    error = None
+                except AssertionError as mismatch:
+                    error = str(mismatch).splitlines()[0]
+                rows.append((label, name, error))
+    return rows
+
+
+def run_ingest_parity(stations, years):
+    """Ingest the last month of readings as a delta onto a frame opened from
+    the column store, and compare AQI category counts with a full rebuild.
+
+    Readings are set to the top of every AQI segment first, where rounding
+    of the stored values would move them into the next category. A source
+    with one label that disagrees with its concentration must fail to load.
+    Returns ``(pollutant, check, error)`` rows, ``error`` None when both
+    agree.
+    """
+    df = generate_main_data(stations, years)
+    rng = np.random.default_rng(1)
+    for pollutant in CATEGORY_COLUMNS.values():
+        edges = rng.random(len(df)) < 0.05
+        df.loc[edges, pollutant] = rng.choice(SCALES[pollutant].high, int(edges.sum()))
+    for column, pollutant in CATEGORY_COLUMNS.items():
+        scale = SCALES[pollutant]
+        df[column] = scale.labels(scale.codes(df[pollutant]))
+    cutoff = df["date_time"].max() - pd.Timedelta(days=30)
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "main_data.csv")
+        full_path = os.path.join(directory, "full.csv")
+        df.to_csv(full_path, index=False)
+        df[df["date_time"] <= cutoff].to_csv(path, index=False)
+        loader.write_column_store(path)
+        # Built before the delta arrives, so ingestion updates it by append.
+        loader.load_derived("category_counts", CategoryCounts.from_frame, path)
+        df[df["date_time"] > cutoff].to_csv(
+            os.path.join(directory, "main_data_delta.csv"), index=False)
+        merged = loader.load_main_data(path)
+        ingested = loader.load_derived("category_counts", CategoryCounts.from_frame, path)
+        full = loader.read_source_csv(full_path)
+        rebuilt = CategoryCounts.from_frame(full)
+        for column, pollutant in CATEGORY_COLUMNS.items():
+            scale = SCALES[pollutant]
+            expected = np.bincount(scale.codes(full[pollutant]) + 1)
+            actual = np.bincount(scale.codes(merged[pollutant]) + 1, minlength=len(expected))
+            error = None
+            if not np.array_equal(expected, actual):
+                error = f"{int(np.abs(expected - actual).sum() // 2)} readings miscategorized"
+            rows.append((pollutant, "readings", error))
+            try:
+                pd.testing.assert_series_equal(ingested.nunique(column), rebuilt.nunique(column))
+                error = None
+            except AssertionError as mismatch:
+                error = str(mismatch).splitlines()[0]
+            rows.append((pollutant, "category_counts", error))
+
+            mislabelled = df.head(100).copy()
+            row = mislabelled[pollutant].first_valid_index()
+            mislabelled[column] = mislabelled[column].astype(object)
+            mislabelled.loc[row, column] = next(
+                label for label in scale.categories if label != mislabelled.loc[row, column])
+            mislabelled_path = os.path.join(directory, "mislabelled.csv")
+            mislabelled.to_csv(mislabelled_path, index=False)
+            try:
+                loader.read_source_csv(mislabelled_path)
+                error = "mislabelled source loaded"
+            except ValueError:
+                error = None
+            rows.append((pollutant, "labels", error))
+    return rows
+
+
+def run_quantile_accuracy(stations, years):
+    """Largest relative error of the sketched tile quantiles against exact
+    quantiles of the selected rows, per selection and pollutant."""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "main_data.csv")
+        generate_main_data(stations, years).to_csv(path, index=False)
+        df = loader.read_source_csv(path)
+        catalog = DatasetCatalog.from_frame(df)
+        data_index = DatasetIndex.from_frame(df)
+        sketches = QuantileSketches.from_frame(df)
+        for label, (selection, row_filter, _) in selections(catalog).items():
+            main_df = data_index.select(**row_filter)
+            for pollutant in SKETCH_POLLUTANTS:
+                exact = np.quantile(main_df[pollutant].dropna().to_numpy(dtype=float),
+                                    TILE_QUANTILES, method="inverted_cdf")
+                sketched = sketches.quantiles(pollutant, TILE_QUANTILES, **selection)
+                error = np.abs(sketched.to_numpy() - exact) / np.maximum(exact, MIN_VALUE)
+                rows.append((label, pollutant, float(error.max())))
+    return rows
+
+
+# Line charts the dashboard downsamples, as (name, aggregate, series, method).
+DOWNSAMPLED_CHARTS = [
+    ("avg_aqi[D]", lambda rollup, rolling, selection, annual_periods:
+        create_avg_aqi_df(rollup, selection, "D"), ["avg_pm2_5", "avg_pm10"], "lttb"),
+    ("agg[W]", lambda rollup, rolling, selection, annual_periods:
+        create_agg_df(rollup, selection, "W", annual_periods),
+     ["avg_pm2_5", "avg_pm10", "avg_so2", "avg_no2", "avg_co"], "minmax"),
+    ("rolling_aqi", lambda rollup, rolling, selection, annual_periods:
+        create_rolling_aqi_df(rolling, selection, "PM2.5"), ["rolling_24h", "nowcast"], "lttb"),
+]
+
+
+def downsampling_error(df, columns, rows):
+    """Why the kept ``rows`` misrepresent ``columns`` of ``df``, or None."""
+    kept = df.iloc[rows]
+    gap_rows = set()
+    for column in columns:
+        values = df[column].to_numpy(dtype=float)
+        if not np.isfinite(values).any():
+            continue
+        kept_values = kept[column].to_numpy(dtype=float)
+        if np.nanmin(kept_values) != np.nanmin(values) or np.nanmax(kept_values) != np.nanmax(values):
+            return f"{column}: extremes dropped"
+        # Every gap between runs needs a kept NaN row, or the line crosses it.
+        starts, stops = finite_runs(values)
+        for stop, next_start in zip(stops[:-1], starts[1:]):
+            inside = (rows >= stop) & (rows < next_start)
+            if not np.isnan(values[rows[inside]]).any():
+                return f"{column}: line drawn across the gap at row {stop}"
+        gap_rows.update(stops[:-1].tolist())
+    if len(rows) > DEFAULT_MAX_POINTS + len(gap_rows):
+        return f"{len(rows)} points kept, {len(gap_rows)} of them gap rows"
+    return None
+
+
+def run_downsampling(stations, years):
+    """Check that downsampled line charts keep every series' extremes, break
+    at gaps and stay within the point budget plus one row per gap. Annual
+    selections of non-adjacent periods leave a gap of NaN days between
+    them; blanking every fourth row leaves thousands of short runs."""
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "main_data.csv")
+        generate_main_data(stations, years).to_csv(path, index=False)
+        df = loader.read_source_csv(path)
+        catalog = DatasetCatalog.from_frame(df)
+        rollup = DailyRollup.from_frame(df)
+        rolling = RollingAqi.from_frame(df)
+        cases = {label: (selection, annual_periods)
+                 for label, (selection, _, annual_periods) in selections(catalog).items()}
+        periods = catalog.annual_periods
+        cases["annual_gap"] = ({"annual_periods": [periods[0], periods[-1]]},
+                               [periods[0], periods[-1]])
+        for label, (selection, annual_periods) in cases.items():
+            for name, create, columns, method in DOWNSAMPLED_CHARTS:
+                chart_df = create(rollup, rolling, selection, annual_periods)
+                kept = downsample_rows(chart_df, columns, method=method)
+                rows.append((label, name, downsampling_error(chart_df, columns, kept)))
+        for name, create, columns, method in DOWNSAMPLED_CHARTS:
+            chart_df = create(rollup, rolling, {}, ["", ""]).copy()
+            chart_df.loc[chart_df.index[::4], columns] = np.nan
+            kept = downsample_rows(chart_df, columns, method=method)
+            rows.append(("many_gaps", name, downsampling_error(chart_df, columns, kept)))
+    return rows
+
+
+def run_app(directory, repeat):
+    """End-to-end Streamlit reruns of dashboard.py, charts included."""
+    from streamlit.testing.v1 import AppTest
+
+    dashboard = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard.py")
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        app = AppTest.from_file(dashboard, default_timeout=600)
+        first_run, _ = time_call(app.run, repeat=1)
+        reruns, _ = time_call(app.run, repeat=repeat)
+        return [summarize("app.first_run", first_run), summarize("app.rerun", reruns)]
+    finally:
+        os.chdir(cwd)
+
+
+def run_sessions(directory, sessions):
+    """Traced memory after each of ``sessions`` concurrent AppTest sessions.
+
+    Every session picks two annual periods, the selection that gathers rows
+    from all stations, and is kept alive while the next one starts, as
+    browser tabs on one server would be.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    dashboard = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard.py")
+    cwd = os.getcwd()
+    os.chdir(directory)
+    tracemalloc.start()
+    try:
+        apps = []
+        results = []
+        for session in range(sessions):
+            app = AppTest.from_file(dashboard, default_timeout=600)
+            app.run()
+            app.sidebar.selectbox[0].set_value("Tahunan")
+            app.run()
+            app.sidebar.checkbox(key="9").check()
+            app.sidebar.checkbox(key="10").check()
+            app.run()
+            apps.append(app)
+            gc.collect()
+            traced, _ = tracemalloc.get_traced_memory()
+            results.append({"sessions": session + 1, "traced_mib": traced / 2**20})
+        return results
+    finally:
+        tracemalloc.stop()
+        os.chdir(cwd)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=12)
+    parser.add_argument("--years", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--app", action="store_true",
+                        help="also time full Streamlit reruns of dashboard.py")
+    parser.add_argument("--json", metavar="PATH",
+                        help="append results to a JSON-lines file")
+    parser.add_argument("--sessions", type=int, metavar="N",
+                        help="instead, measure memory held by N concurrent sessions")
+    parser.add_argument("--max-session-mib", type=float, default=MAX_SESSION_MIB,
+                        help="with --sessions, fail when each session after the first "
+                             "adds more than this on average")
+    parser.add_argument("--parity", action="store_true",
+                        help="instead, check the SQL backend against the pandas path")
+    parser.add_argument("--ingest", action="store_true",
+                        help="instead, check delta ingestion onto the column store "
+                             "against a full rebuild")
+    parser.add_argument("--quantiles", action="store_true",
+                        help="instead, check sketched quantiles against exact ones")
+    parser.add_argument("--downsampling", action="store_true",
+                        help="instead, check that downsampled charts keep extremes and gaps")
+    args = parser.parse_args(argv)
+
+    if args.quantiles:
+        rows = run_quantile_accuracy(args.stations, args.years)
+        for label, pollutant, error in rows:
+            print(f"{label + '.' + pollutant:48s} max relative error {error:.4f}")
+        # A little slack for floating-point rounding at bucket bounds.
+        failures = sum(error > RELATIVE_ACCURACY * (1 + 1e-6) for _, _, error in rows)
+        print(f"{len(rows) - failures}/{len(rows)} within {RELATIVE_ACCURACY:g}")
+        return 1 if failures else 0
+
+    if args.ingest:
+        rows = run_ingest_parity(args.stations, args.years)
+        for pollutant, check, error in rows:
+            print(f"{pollutant + '.' + check:48s} {'ok' if error is None else error}")
+        failures = sum(error is not None for _, _, error in rows)
+        print(f"{len(rows) - failures}/{len(rows)} ingestion checks pass")
+        return 1 if failures else 0
+
+    if args.parity:
+        rows = run_parity(args.stations, args.years)
+        for label, name, error in rows:
+            print(f"{label + '.' + name:48s} {'ok' if error is None else error}")
+        failures = sum(error is not None for _, _, error in rows)
+        print(f"{len(rows) - failures}/{len(rows)} aggregates match")
+        return 1 if failures else 0
+
+    if args.downsampling:
+        rows = run_downsampling(args.stations, args.years)
+        for label, name, error in rows:
+            print(f"{label + '.' + name:48s} {'ok' if error is None else error}")
+        failures = sum(error is not None for _, _, error in rows)
+        print(f"{len(rows) - failures}/{len(rows)} charts keep extremes and gaps")
+        return 1 if failures else 0
+
+    if args.sessions:
+        with tempfile.TemporaryDirectory() as directory:
+            generate_main_data(args.stations, args.years).to_csv(
+                os.path.join(directory, "main_data.csv"), index=False)
+            results = run_sessions(directory, args.sessions)
+        print(f"{'sessions':>8s} {'traced MiB':>12s} {'added MiB':>10s}")
+        for previous, result in zip([None] + results, results):
+            added = result["traced_mib"] - previous["traced_mib"] if previous else 0
+            print(f"{result['sessions']:8d} {result['traced_mib']:12.1f} {added:10.1f}")
+        if len(results) < 2:
+            return 0
+        # The first session loads the shared dataset; later ones should only
+        # add their own state.
+        per_session = (results[-1]["traced_mib"] - results[0]["traced_mib"]) / (len(results) - 1)
+        print(f"{per_session:.2f} MiB per additional session, "
+              f"limit {args.max_session_mib:g} MiB")
+        return 1 if per_session > args.max_session_mib else 0
+
+    results = run_benchmarks(args.stations, args.years, args.repeat, args.app)
+    print(f"{'benchmark':48s} {'rows':>10s} {'median ms':>10s} {'min ms':>10s}")
+    for result in results:
+        rows = "" if result["rows"] is None else str(result["rows"])
+        print(f"{result['name']:48s} {rows:>10s} "
+              f"{result['median_ms']:10.2f} {result['min_ms']:10.2f}")
+
+    if args.json:
+        run = {"time": time.time(), "stations": args.stations, "years": args.years,
+               "repeat": args.repeat}
+        with open(args.json, "a") as log:
+            for result in results:
+                log.write(json.dumps({**run, **result}) + "\n")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
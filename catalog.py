@@ -0,0 +1,61 @@
+class DatasetCatalog:
+    """Dataset metadata the sidebar widgets need, computed once per load."""
+
+    def __init__(self, stations, annual_periods, period_bounds, min_date, max_date,
+                 station_rows, period_rows):
+        self.stations = stations
+        self.annual_periods = annual_periods
+        self.period_bounds = period_bounds
+        self.min_date = min_date
+        self.max_date = max_date
+        self.station_rows = station_rows
+        self.period_rows = period_rows
+
+    @classmethod
+    def from_frame(cls, df):
+        station_rows = df["station"].value_counts().sort_index()
+        periods = df.groupby("annually_period", observed=True)["date_time"].agg(
+            ["min", "max", "size"])
+        return cls(
+            stations=station_rows.index.tolist(),
+            annual_periods=[str(label) for label in periods.index],
+            period_bounds={
+                str(label): (row["min"], row["max"]) for label, row in periods.iterrows()
+            },
+            min_date=df["date_time"].min(),
+            max_date=df["date_time"].max(),
+            station_rows=station_rows.to_dict(),
+            period_rows={str(label): size for label, size in periods["size"].items()},
+        )
+
+    def merge(self, other):
+        period_bounds = dict(self.period_bounds)
+        for label, (first, last) in other.period_bounds.items():
+            if label in period_bounds:
+                first = min(first, period_bounds[label][0])
+                last = max(last, period_bounds[label][1])
+            period_bounds[label] = (first, last)
+        station_rows = dict(self.station_rows)
+        for station, rows in other.station_rows.items():
+            station_rows[station] = station_rows.get(station, 0) + rows
+        period_rows = dict(self.period_rows)
+        for label, rows in other.period_rows.items():
+            period_rows[label] = period_rows.get(label, 0) + rows
+        return DatasetCatalog(
+            stations=sorted(station_rows),
+            annual_periods=sorted(period_bounds),
+            period_bounds=period_bounds,
+            min_date=min(self.min_date, other.min_date),
+            max_date=max(self.max_date, other.max_date),
+            station_rows=station_rows,
+            period_rows=period_rows,
+        )
+
+    def append(self, delta, df):
+        return self.merge(DatasetCatalog.from_frame(delta))
+
+    def period_dates(self, annual_periods):
+        """First and last calendar day covered by the given annual periods."""
+        starts = [self.period_bounds[label][0] for label in annual_periods]
+        ends = [self.period_bounds[label][1] for label in annual_periods]
+        return min(starts).date(), max(ends).date()
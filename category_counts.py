@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from aqi import CATEGORY_COLUMNS, SCALES
+
+
+class CategoryCounts:
+    """Distinct ``idx`` values seen per AQI category, as bitmaps.
+
+    The category charts count ``idx.nunique()`` per category, which is not
+    additive across row batches. A ``(category, idx)`` bitmap is: merging two
+    batches is an element-wise OR, and the count is a row sum. Categories are
+    derived from the concentrations, so the precomputed label columns are not
+    needed.
+    """
+
+    def __init__(self, seen):
+        self.seen = seen
+
+    @classmethod
+    def from_frame(cls, df, columns=CATEGORY_COLUMNS):
+        idx = df["idx"].to_numpy(dtype=np.int64)
+        width = int(idx.max()) + 1 if len(idx) else 0
+        seen = {}
+        for column in columns:
+            scale = SCALES[CATEGORY_COLUMNS[column]]
+            codes = scale.codes(df[CATEGORY_COLUMNS[column]])
+            valid = codes >= 0
+            cells = codes[valid].astype(np.int64) * width + idx[valid]
+            shape = (len(scale.categories), width)
+            seen[column] = (np.bincount(cells, minlength=shape[0] * width) > 0).reshape(shape)
+        return cls(seen)
+
+    def merge(self, other):
+        seen = {}
+        for column, bitmap in self.seen.items():
+            width = max(bitmap.shape[1], other.seen[column].shape[1])
+            merged = np.zeros((bitmap.shape[0], width), dtype=bool)
+            merged[:, :bitmap.shape[1]] |= bitmap
+            merged[:, :other.seen[column].shape[1]] |= other.seen[column]
+            seen[column] = merged
+        return CategoryCounts(seen)
+
+    def append(self, delta, df):
+        return self.merge(CategoryCounts.from_frame(delta, list(self.seen)))
+
+    def nunique(self, column):
+        """Same counts as ``df.groupby(column).idx.nunique()``, in category
+        order."""
+        categories = np.asarray(SCALES[CATEGORY_COLUMNS[column]].categories, dtype=object)
+        counts = self.seen[column].sum(axis=1)
+        present = counts > 0
+        return pd.Series(counts[present], name="idx",
+                         index=pd.Index(categories[present], name=column))
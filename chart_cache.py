@@ -0,0 +1,137 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+
+import pandas as pd
+
+from disk_cache import MISSING
+
+# Same output st.pyplot produces, so cached images look identical.
+SAVEFIG_OPTIONS = {"format": "png", "dpi": 200, "bbox_inches": "tight"}
+
+# Process-wide render pools by worker count; modules are not re-executed on
+# Streamlit reruns.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def chart_key(name, *parts):
+    """Hash of a chart's plotted data and styling parameters."""
+    digest = hashlib.sha1(name.encode())
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            labels = part.columns if isinstance(part, pd.DataFrame) else part.name
+            digest.update(repr(labels).encode())
+            digest.update(pd.util.hash_pandas_object(part).to_numpy().tobytes())
+        else:
+            digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+
+class ChartCache:
+    """LRU cache of rendered PNG bytes, bounded by total image size, in
+    front of an optional ``DiskCache`` ``store``."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, store=None):
+        self.max_bytes = max_bytes
+        self.store = store
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render, *args):
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return self._images[key]
+            self.misses += 1
+        image = self._load(key)
+        if image is None:
+            image = render_png(render, *args)
+            self._persist(key, image)
+        self._store(key, image)
+        return image
+
+    def submit(self, executor, key, render, *args, timer=nullcontext):
+        """Future of the PNG bytes; on a miss the chart is rendered on
+        ``executor`` and cached when it completes. The render runs inside
+        ``timer()``, on the worker thread."""
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                self.hits += 1
+                future = Future()
+                future.set_result(self._images[key])
+                return future
+            self.misses += 1
+        image = self._load(key)
+        if image is not None:
+            self._store(key, image)
+            future = Future()
+            future.set_result(image)
+            return future
+
+        def store(done):
+            if done.exception() is None:
+                self._store(key, done.result())
+                self._persist(key, done.result())
+
+        def timed_render():
+            with timer():
+                return render_png(render, *args)
+
+        future = executor.submit(timed_render)
+        future.add_done_callback(store)
+        return future
+
+    def _load(self, key):
+        if self.store is None:
+            return None
+        image = self.store.get(key)
+        return None if image is MISSING else image
+
+    def _persist(self, key, image):
+        if self.store is not None:
+            self.store.put(key, image)
+
+    def _store(self, key, image):
+        with self._lock:
+            if key not in self._images:
+                self._images[key] = image
+                self.total_bytes += len(image)
+            while self.total_bytes > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._images),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def render_png(render, *args):
+    image = io.BytesIO()
+    render(*args).savefig(image, **SAVEFIG_OPTIONS)
+    return image.getvalue()
+
+
+def render_pool(max_workers):
+    """Thread pool for ``render_png``, shared by every session. Builders draw
+    on their own ``Figure``, and the PNG encoding that dominates a render
+    releases the GIL."""
+    with _pools_lock:
+        if max_workers not in _pools:
+            _pools[max_workers] = ThreadPoolExecutor(
+                max_workers, thread_name_prefix="chart-render")
+        return _pools[max_workers]
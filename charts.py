@@ -0,0 +1,321 @@
+"""Chart builders for the dashboard.
+
+Every builder takes its aggregate frames and styling arguments and returns
+a new ``Figure`` drawn through its own ``Axes``, never through pyplot's
+current figure, so several charts can be built at once in threads or
+worker processes.
+"""
+import seaborn as sns
+from matplotlib.figure import Figure
+
+sns.set(style="dark")
+
+BEST_WORST_COLORS = ["yellow", "lightgrey", "lightgrey",
+                     "lightgrey", "lightgrey", "green"]
+
+
+def pollutant_title(pm2_5_var, pm10_var, suffix):
+    concatenation = " and " if pm2_5_var == "PM2.5" and pm10_var == "PM10" else ""
+    return f"Average Number of {pm2_5_var}{concatenation}{pm10_var} {suffix}"
+
+
+def plot_avg_aqi_pm2_5(ax, x_axis, avg_aqi_df):
+    ax.plot(
+        x_axis,
+        avg_aqi_df['avg_pm2_5'],
+        linewidth=2,
+        marker='o',
+        label='PM2.5',
+        color='brown'
+    )
+
+
+def plot_avg_aqi_pm10(ax, x_axis, avg_aqi_df):
+    ax.plot(
+        x_axis,
+        avg_aqi_df['avg_pm10'],
+        linewidth=2,
+        marker='o',
+        label='PM10',
+        color='orange'
+    )
+
+
+def plot_percentile_band(ax, x_axis, band_df, prefix, label, color):
+    low, high = [column for column in band_df.columns if column.startswith(f"{prefix}_p")]
+    ax.fill_between(
+        x_axis,
+        band_df[low].to_numpy(dtype=float),
+        band_df[high].to_numpy(dtype=float),
+        color=color,
+        alpha=0.2,
+        linewidth=0,
+        label=f"{label} {low[len(prefix) + 2:]}th–{high[len(prefix) + 2:]}th percentile"
+    )
+
+
+def render_avg_aqi(x_axis, avg_aqi_df, pm2_5_var, pm10_var, date_plt_title, band_df=None):
+    fig = Figure(figsize=(10, 7))
+    ax = fig.subplots()
+    ax.grid(zorder=0)
+    ax.set_ylabel("Concentration (μg/m³)")
+    if pm2_5_var == "PM2.5":
+        if band_df is not None:
+            plot_percentile_band(ax, x_axis, band_df, "pm2_5", "PM2.5", "brown")
+        plot_avg_aqi_pm2_5(ax, x_axis, avg_aqi_df)
+    if pm10_var == "PM10":
+        if band_df is not None:
+            plot_percentile_band(ax, x_axis, band_df, "pm10", "PM10", "orange")
+        plot_avg_aqi_pm10(ax, x_axis, avg_aqi_df)
+    ax.legend()
+    ax.set_title(pollutant_title(pm2_5_var, pm10_var, date_plt_title))
+    return fig
+
+
+def render_best_worst_aqi(leaderboard_df, parameter, score_label="Concentration (μg/m³)"):
+    fig = Figure(figsize=(20, 8))
+    ax = fig.subplots(nrows=1, ncols=2)
+    sns.barplot(
+        x="score",
+        y="station",
+        data=leaderboard_df[leaderboard_df["side"] == "worst"],
+        palette=BEST_WORST_COLORS, ax=ax[0]
+    )
+    ax[0].set_title(f"Worst AQI by {parameter}", fontsize=20)
+    ax[0].set_xlabel(score_label, fontsize=16)
+    ax[0].set_ylabel(None)
+    ax[0].tick_params(labelsize=15)
+    sns.barplot(
+        x="score",
+        y="station",
+        data=leaderboard_df[leaderboard_df["side"] == "best"],
+        palette=list(reversed(BEST_WORST_COLORS)), ax=ax[1]
+    )
+    ax[1].set_title(f"Best AQI by {parameter}", fontsize=20)
+    ax[1].set_xlabel(score_label, fontsize=16)
+    ax[1].invert_xaxis()
+    ax[1].yaxis.set_label_position("right")
+    ax[1].yaxis.tick_right()
+    ax[1].set_ylabel(None)
+    ax[1].tick_params(labelsize=15)
+    fig.suptitle(f"Worst and Best AQI by {parameter}", fontsize=24)
+    return fig
+
+
+def render_daily_avg_aqi(daily_avg_aqi_df, pm2_5_var, pm10_var):
+    fig = Figure(figsize=(10, 7))
+    ax = fig.subplots()
+    ax.grid(zorder=0)
+    ax.set_ylabel("Concentration (μg/m³)")
+    if pm2_5_var == "PM2.5":
+        ax.plot(
+            daily_avg_aqi_df['day'],
+            daily_avg_aqi_df['avg_pm2_5'],
+            linewidth=2,
+            marker='o',
+            label='PM2.5',
+            color='brown')
+    if pm10_var == "PM10":
+        ax.plot(
+            daily_avg_aqi_df['day'],
+            daily_avg_aqi_df['avg_pm10'],
+            linewidth=2,
+            marker='o',
+            label='PM10',
+            color='orange')
+    ax.legend()
+    ax.set_title(pollutant_title(pm2_5_var, pm10_var, "per-Day"))
+    return fig
+
+
+def render_hourly_avg_aqi(hourly_avg_aqi_df, pm2_5_var, pm10_var):
+    fig = Figure(figsize=(10, 7))
+    ax = fig.subplots()
+    ax.grid(zorder=0)
+    ax.set_ylabel("Concentration (μg/m³)")
+    ax.tick_params(axis="x", labelrotation=45)
+    if pm2_5_var == "PM2.5":
+        ax.plot(
+            hourly_avg_aqi_df['hour'],
+            hourly_avg_aqi_df['PM2.5'],
+            linewidth=2,
+            marker='o',
+            label='PM2.5',
+            color='brown')
+    if pm10_var == "PM10":
+        ax.plot(
+            hourly_avg_aqi_df['hour'],
+            hourly_avg_aqi_df['PM10'],
+            linewidth=2,
+            marker='o',
+            label='PM10',
+            color='orange')
+    ax.legend()
+    ax.set_title(pollutant_title(pm2_5_var, pm10_var, "per-Hour"))
+    return fig
+
+
+def render_weekday_hour(weekday_hour_df, pollutant):
+    fig = Figure(figsize=(15, 5))
+    ax = fig.subplots()
+    sns.heatmap(
+        weekday_hour_df,
+        cmap="YlOrBr",
+        ax=ax,
+        cbar_kws={"label": "Concentration (μg/m³)"}
+    )
+    ax.set_title(f"Average Number of {pollutant} per-Day and Hour", fontsize=18)
+    ax.set_xlabel("Hour", fontsize=14)
+    ax.set_ylabel(None)
+    return fig
+
+
+def set_custom_palette(counts, colors):
+    max_count = counts.max()
+    palettes = [colors[1] if count == max_count else colors[0]
+                for count in counts]
+    return palettes
+
+
+def render_aqi_by_pm2_5(aqi_by_pm2_5_df, color_list):
+    fig = Figure(figsize=(15, 5))
+    ax = fig.subplots()
+    sns.barplot(
+        y="aqi_by_pm2_5_count",
+        x="AQIBYPM2.5",
+        data=aqi_by_pm2_5_df,
+        palette=set_custom_palette(aqi_by_pm2_5_df.sort_values(by="AQIBYPM2.5")[
+                                   "aqi_by_pm2_5_count"], color_list),
+        ax=ax
+    )
+    ax.set_title("Number of AQI Categories by PM2.5", fontsize=20)
+    ax.set_xlabel("Categories", fontsize=15)
+    ax.set_ylabel(None)
+    return fig
+
+
+def render_aqi_by_pm10(aqi_by_pm10_df, color_list):
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
+    sns.barplot(
+        y="aqi_by_pm10_count",
+        x="AQIBYPM10",
+        data=aqi_by_pm10_df,
+        palette=set_custom_palette(aqi_by_pm10_df.sort_values(by="AQIBYPM10")[
+                                   "aqi_by_pm10_count"], color_list),
+        ax=ax
+    )
+    ax.set_title("Number of AQI Categories by PM10", fontsize=20)
+    ax.set_xlabel("Categories", fontsize=14)
+    ax.set_ylabel(None)
+    return fig
+
+
+def render_agg(agg_df, period_plt_title):
+    fig = Figure(figsize=(15, 10))
+    ax0 = fig.subplots()
+    ax0.grid(zorder=0)
+    ax0.plot(
+        agg_df.date_time,
+        agg_df.avg_pm2_5,
+        label='PM2.5',
+        color='blue',
+        linewidth=3,
+        marker='o'
+    )
+    ax0.plot(
+        agg_df.date_time,
+        agg_df.avg_pm10,
+        label='PM10',
+        color='orange',
+        linewidth=3,
+        marker='o'
+    )
+    ax0.plot(
+        agg_df.date_time,
+        agg_df.avg_so2,
+        label='SO₂',
+        color='green',
+        linestyle=':',
+        linewidth=2,
+        marker='o'
+    )
+    ax0.plot(
+        agg_df.date_time,
+        agg_df.avg_no2,
+        label='NO₂',
+        color='red',
+        linestyle='--',
+        linewidth=2,
+        marker='o'
+    )
+    ax0.set_ylabel("Concentration PM2.5, PM10, SO₂, NO₂ (μg/m³)", fontsize=12)
+    ax0.tick_params(axis="x", labelrotation=45)
+    ax1 = ax0.twinx()
+    ax1.plot(
+        agg_df.date_time,
+        agg_df.avg_co,
+        label='CO',
+        color='purple',
+        linestyle='-.',
+        marker='o'
+    )
+    ax1.yaxis.tick_right()
+    ax1.set_ylabel("Concentration CO (μg/m³)",
+                   size=12, rotation=270, labelpad=20)
+    ax1.set_xlabel(None)
+    lines1, labels1 = ax0.get_legend_handles_labels()
+    lines2, labels2 = ax1.get_legend_handles_labels()
+    ax1.legend(lines1 + lines2, labels1 + labels2)
+    ax1.set_title(
+        f'Correlation Belong PM2.5, PM10, SO₂, NO₂, and CO {period_plt_title}', fontsize=18)
+    return fig
+
+
+def render_rolling_aqi(rolling_aqi_df, pollutant, threshold):
+    fig = Figure(figsize=(15, 6))
+    ax = fig.subplots()
+    ax.grid(zorder=0)
+    ax.plot(
+        rolling_aqi_df['date_time'],
+        rolling_aqi_df['nowcast'],
+        linewidth=1,
+        label='NowCast',
+        color='orange',
+        alpha=0.6)
+    ax.plot(
+        rolling_aqi_df['date_time'],
+        rolling_aqi_df['rolling_24h'],
+        linewidth=2,
+        label='24-hour average',
+        color='brown')
+    ax.axhline(threshold, color='red', linestyle='--', linewidth=1.5,
+               label=f'AQI 100 ({threshold:g} μg/m³)')
+    ax.set_ylabel("Concentration (μg/m³)")
+    ax.legend()
+    ax.set_title(f"24-hour Average and NowCast of {pollutant}", fontsize=18)
+    return fig
+
+
+POLLUTANT_LABELS = {"PM2.5": "PM2.5", "PM10": "PM10", "SO2": "SO₂", "NO2": "NO₂", "CO": "CO"}
+
+
+def render_correlation(correlation_df):
+    labels = [POLLUTANT_LABELS.get(pollutant, pollutant) for pollutant in correlation_df.columns]
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    sns.heatmap(
+        correlation_df,
+        annot=True,
+        fmt=".2f",
+        cmap="coolwarm",
+        vmin=-1,
+        vmax=1,
+        square=True,
+        xticklabels=labels,
+        yticklabels=labels,
+        ax=ax,
+        cbar_kws={"label": "Pearson r"}
+    )
+    ax.set_title("Correlation of Hourly PM2.5, PM10, SO₂, NO₂, and CO", fontsize=14)
+    return fig
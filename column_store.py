@@ -0,0 +1,161 @@
+"""Memory-mapped columnar store of the source rows.
+
+One file: a fixed prefix, a JSON header and one raw little-endian array per
+column, each starting on a page boundary. Timestamps are int64
+nanoseconds, float columns (the pollutants) float64, other integers the
+smallest int type that fits, and string or categorical columns (station,
+annual period, AQI categories) small int codes with their labels in the
+header. Opening the store maps the file and wraps every column without
+reading it, so the OS pages in only the columns and row ranges a view
+touches, and processes opening the same file share its page cache.
+
+Run ``python column_store.py`` to convert ``main_data.csv``.
+"""
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+# Version 2 stores floats as float64: float32 readings merged with float64
+# delta rows kept their float32 rounding and moved AQI categories.
+MAGIC = b"AQICOLS2"
+# Magic, header length, offset of the first column.
+PREFIX = struct.Struct("<8sQQ")
+ALIGNMENT = 4096
+INT_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def small_int_dtype(low, high):
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    raise ValueError(f"integers out of range: {low}..{high}")
+
+
+def encode_column(series):
+    """(header entry, array) of one column in its stored form."""
+    if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object:
+        values = pd.Categorical(series)
+        codes = values.codes
+        codes = codes.astype(small_int_dtype(-1, len(values.categories)), copy=False)
+        return {"kind": "categorical", "categories": values.categories.tolist()}, codes
+    if pd.api.types.is_datetime64_dtype(series.dtype):
+        values = series.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        return {"kind": "datetime"}, values
+    if pd.api.types.is_float_dtype(series.dtype):
+        return {"kind": "values"}, series.to_numpy(dtype=np.float64)
+    if pd.api.types.is_integer_dtype(series.dtype):
+        values = series.to_numpy()
+        low, high = (int(values.min()), int(values.max())) if len(values) else (0, 0)
+        return {"kind": "values"}, values.astype(small_int_dtype(low, high), copy=False)
+    raise TypeError(f"cannot store column {series.name!r} of dtype {series.dtype}")
+
+
+def write_store(df, path, fingerprint, layout):
+    """Write ``df`` to ``path`` through a temporary file, tagged with the
+    source fingerprint and row layout."""
+    columns = []
+    arrays = []
+    offset = 0
+    for name in df.columns:
+        entry, values = encode_column(df[name])
+        values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder("<"))
+        entry.update(name=name, dtype=values.dtype.str, offset=offset)
+        columns.append(entry)
+        arrays.append(values)
+        offset = align(offset + values.nbytes)
+    header = json.dumps({
+        "source_fingerprint": fingerprint,
+        "layout": layout,
+        "rows": len(df),
+        "columns": columns,
+    }).encode()
+    data_offset = align(PREFIX.size + len(header))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            file.write(PREFIX.pack(MAGIC, len(header), data_offset))
+            file.write(header)
+            for entry, values in zip(columns, arrays):
+                file.seek(data_offset + entry["offset"])
+                file.write(values.tobytes())
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_header(path):
+    """(header, data offset) of a store, or None if it is missing or not a
+    store."""
+    try:
+        with open(path, "rb") as file:
+            prefix = file.read(PREFIX.size)
+            if len(prefix) < PREFIX.size:
+                return None
+            magic, header_length, data_offset = PREFIX.unpack(prefix)
+            if magic != MAGIC:
+                return None
+            return json.loads(file.read(header_length)), data_offset
+    except (OSError, ValueError):
+        return None
+
+
+def store_is_current(path, fingerprint, layout):
+    found = read_header(path)
+    return (found is not None
+            and found[0]["source_fingerprint"] == fingerprint
+            and found[0]["layout"] == layout)
+
+
+def read_store(path, fingerprint, layout):
+    """Frame whose columns are read-only views of the mapped file, or None
+    when the store is missing or was written for another source."""
+    found = read_header(path)
+    if found is None:
+        return None
+    header, data_offset = found
+    if header["source_fingerprint"] != fingerprint or header["layout"] != layout:
+        return None
+    rows = header["rows"]
+    try:
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    except (OSError, ValueError):
+        return None
+    columns = {}
+    for entry in header["columns"]:
+        dtype = np.dtype(entry["dtype"])
+        start = data_offset + entry["offset"]
+        values = buffer[start:start + rows * dtype.itemsize].view(dtype)
+        if entry["kind"] == "categorical":
+            columns[entry["name"]] = pd.Categorical.from_codes(
+                values, entry["categories"], validate=False)
+        elif entry["kind"] == "datetime":
+            columns[entry["name"]] = values.view("datetime64[ns]")
+        else:
+            columns[entry["name"]] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def main(argv=None):
+    import loader
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default="main_data.csv")
+    args = parser.parse_args(argv)
+    store_path = loader.write_column_store(args.path)
+    print(f"wrote {store_path} ({os.path.getsize(store_path) / 2 ** 20:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from grid import StationGrid
+from rollup import POLLUTANTS
+
+
+def combine(counts_a, means_a, m2_a, comoments_a, counts_b, means_b, m2_b, comoments_b):
+    """Chan et al. pairwise update of count, means, squared deviations and
+    co-moment, element by element; empty cells stay empty."""
+    counts = counts_a + counts_b
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight = np.where(counts > 0, counts_b / counts, 0.0)
+        spread = np.where(counts > 0, counts_a * counts_b / counts, 0.0)
+    delta = means_b - means_a
+    means = means_a + delta * weight[:, None]
+    m2 = m2_a + m2_b + delta ** 2 * spread[:, None]
+    comoments = comoments_a + comoments_b + delta[:, 0] * delta[:, 1] * spread
+    return counts, means, m2, comoments
+
+
+class CovarianceRollup:
+    """Per-station, per-day covariance accumulators of every pollutant pair.
+
+    Each ``(station, day)`` cell of a pair holds the count of hours where
+    both pollutants have a reading, their means, their sums of squared
+    deviations from those means and their co-moment. Cells merge with the
+    Chan et al. update, so the Pearson matrix of any station and day
+    selection is assembled from the cells without rescanning the rows and
+    matches ``df.corr()`` on those rows, pairwise-complete like pandas.
+    """
+
+    def __init__(self, grid, pollutants, counts, means, m2, comoments):
+        self.grid = grid
+        self.stations = grid.stations
+        self.station_index = grid.station_index
+        self.pollutants = pollutants
+        self.pairs = list(combinations(range(len(pollutants)), 2))
+        # counts and comoments are (pair, station, day); means and m2 are
+        # (pair, 2, station, day), one row per pollutant of the pair.
+        self.counts = counts
+        self.means = means
+        self.m2 = m2
+        self.comoments = comoments
+
+    @classmethod
+    def from_frame(cls, df, pollutants=POLLUTANTS):
+        grid, station_codes, day_codes = StationGrid.from_frame(df)
+        cells = station_codes * len(grid.times) + day_codes
+        shape = grid.shape
+        size = shape[0] * shape[1]
+
+        values = [df[pollutant].to_numpy(dtype=float) for pollutant in pollutants]
+        pairs = list(combinations(range(len(pollutants)), 2))
+        counts = np.zeros((len(pairs),) + shape, dtype=np.int64)
+        means = np.zeros((len(pairs), 2) + shape)
+        m2 = np.zeros((len(pairs), 2) + shape)
+        comoments = np.zeros((len(pairs),) + shape)
+        for p, pair in enumerate(pairs):
+            valid = ~np.isnan(values[pair[0]]) & ~np.isnan(values[pair[1]])
+            valid_cells = cells[valid]
+            count = np.bincount(valid_cells, minlength=size)
+            counts[p] = count.reshape(shape)
+            deviations = []
+            for side, column in enumerate(pair):
+                column_values = values[column][valid]
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    mean = np.where(count > 0, np.bincount(
+                        valid_cells, column_values, minlength=size) / count, 0.0)
+                # Deviations from the cell mean: a second pass, so the squares
+                # do not cancel the way sum(x²) - n·mean² can.
+                deviation = column_values - mean[valid_cells]
+                means[p, side] = mean.reshape(shape)
+                m2[p, side] = np.bincount(
+                    valid_cells, deviation ** 2, minlength=size).reshape(shape)
+                deviations.append(deviation)
+            comoments[p] = np.bincount(
+                valid_cells, deviations[0] * deviations[1], minlength=size).reshape(shape)
+        return cls(grid, list(pollutants), counts, means, m2, comoments)
+
+    @classmethod
+    def from_parts(cls, grid, parts, pollutants=POLLUTANTS):
+        """Accumulators on ``grid`` over the rows of every rollup in
+        ``parts``. Cells present in several parts are combined."""
+        pairs = len(list(combinations(range(len(pollutants)), 2)))
+        counts = np.zeros((pairs,) + grid.shape, dtype=np.int64)
+        means = np.zeros((pairs, 2) + grid.shape)
+        m2 = np.zeros((pairs, 2) + grid.shape)
+        comoments = np.zeros((pairs,) + grid.shape)
+        for part in parts:
+            rows, columns = grid.include(part.grid)
+            (counts[:, rows, columns], means[:, :, rows, columns],
+             m2[:, :, rows, columns], comoments[:, rows, columns]) = combine(
+                counts[:, rows, columns], means[:, :, rows, columns],
+                m2[:, :, rows, columns], comoments[:, rows, columns],
+                part.counts, part.means, part.m2, part.comoments)
+        return cls(grid, list(pollutants), counts, means, m2, comoments)
+
+    @classmethod
+    def from_chunks(cls, chunks, catalog, pollutants=POLLUTANTS):
+        """Accumulators of chunked rows, allocated once over the catalog's
+        stations and days; every chunk is combined into its cells."""
+        return cls.from_parts(StationGrid.from_catalog(catalog),
+                           (cls.from_frame(chunk, pollutants) for chunk in chunks if len(chunk)),
+                           pollutants)
+
+    def merge(self, other):
+        """Accumulators over the rows of both, on the union of their days
+        and stations."""
+        return CovarianceRollup.from_parts(self.grid.union(other.grid), [self, other],
+                                        self.pollutants)
+
+    def append(self, delta, df):
+        return self.merge(CovarianceRollup.from_frame(delta, self.pollutants))
+
+    def correlation(self, station=None, start=None, end=None, annual_periods=None):
+        """Pearson correlation matrix of the pollutants over the hourly rows
+        of one station, or of all stations, on the selected days."""
+        mask = self.grid.mask(start, end, annual_periods)
+        if station is None:
+            cells = (slice(None), mask)
+        else:
+            cells = (self.station_index[station], mask)
+        counts = self.counts[(slice(None),) + cells].reshape(len(self.pairs), -1)
+        means = self.means[(slice(None), slice(None)) + cells].reshape(len(self.pairs), 2, -1)
+        m2 = self.m2[(slice(None), slice(None)) + cells].reshape(len(self.pairs), 2, -1)
+        comoments = self.comoments[(slice(None),) + cells].reshape(len(self.pairs), -1)
+
+        # All selected cells combined at once around the overall means.
+        total = counts.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            overall = (counts[:, None] * means).sum(axis=2) / total[:, None]
+        deviation = np.where(counts[:, None] > 0, means - overall[..., None], 0.0)
+        squares = m2.sum(axis=2) + (counts[:, None] * deviation ** 2).sum(axis=2)
+        products = comoments.sum(axis=1) + (counts * deviation[:, 0] * deviation[:, 1]).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pair_correlation = np.where(
+                (total > 1) & (squares[:, 0] > 0) & (squares[:, 1] > 0),
+                products / np.sqrt(squares[:, 0] * squares[:, 1]), np.nan)
+
+        matrix = np.eye(len(self.pollutants))
+        for (first, second), value in zip(self.pairs, np.clip(pair_correlation, -1, 1)):
+            matrix[first, second] = matrix[second, first] = value
+        return pd.DataFrame(matrix, index=self.pollutants, columns=self.pollutants)
@@ -1,177 +1,197 @@
+import os
 from datetime import timedelta
+from functools import partial
+from importlib.machinery import ModuleSpec
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import streamlit as st
-sns.set(style="dark")
-
-def create_avg_aqi_df(df, period):
-    avg_aqi_df = df.resample(rule=period, on="date_time").agg({
-        "PM2.5": "mean",
-        "PM10": "mean"
-    })
-    avg_aqi_df = avg_aqi_df.reset_index()
-    avg_aqi_df.rename(columns={
-        "PM2.5": "avg_pm2_5",
-        "PM10": "avg_pm10"
-    }, inplace=True)
-    return avg_aqi_df
-
-def create_aqi_stats_df(df):
-    aqi_stats_df = df.groupby(by="date_time").agg({
-        "PM2.5": ["min", "max", "mean"],
-        "PM10": ["min", "max", "mean"]
-    })
-    aqi_stats_df = aqi_stats_df.reset_index()
-    aqi_stats_df.rename(columns={
-        "PM2.5": "pm2_5_stats",
-        "PM10": "pm10_stats"
-    }, inplace=True)
-    return aqi_stats_df
-
-def create_monthly_per_year_avg_aqi_df(df):
-    monthly_avg_aqi_df = df.resample(rule='M', on='date_time').agg({
-        "PM2.5": "mean",
-        "PM10": "mean"
-    })
-    monthly_avg_aqi_df.index = monthly_avg_aqi_df.index.strftime('%b')
-    monthly_avg_aqi_df = monthly_avg_aqi_df.reset_index()
-    monthly_avg_aqi_df.rename(columns={
-        "date_time": "month",
-        "PM2.5": "avg_pm2_5",
-        "PM10": "avg_pm10"
-    }, inplace=True)
-    return monthly_avg_aqi_df
-
-def create_avg_aqi_by_station_df(df):
-    avg_aqi_by_station_df = df.groupby(by="station").agg({
-        "PM2.5": "mean",
-        "PM10": "mean"
-    }).rename(columns={
-        "PM2.5": "avg_pm2_5",
-        "PM10": "avg_pm10"
-    }).reset_index()
-    return avg_aqi_by_station_df
-
-def create_daily_avg_aqi_df(df):
-    daily_avg_aqi_df = df.resample(rule='D', on='date_time').agg({
-        "PM2.5": "mean",
-        "PM10": "mean"
-    })
-    daily_avg_aqi_df.index = daily_avg_aqi_df.index.strftime('%A')
-    daily_avg_aqi_df = daily_avg_aqi_df.reset_index()
-    daily_avg_aqi_df.rename(columns={
-        "date_time": "day",
-        "PM2.5": "avg_pm2_5",
-        "PM10": "avg_pm10"
-    }, inplace=True)
-    day_order = {
-        'Sunday': 0,
-        'Monday': 1,
-        'Tuesday': 2,
-        'Wednesday': 3,
-        'Thursday': 4,
-        'Friday': 5,
-        'Saturday': 6
-    }
-    daily_avg_aqi_df['day_num'] = daily_avg_aqi_df['day'].map(day_order)
-    daily_avg_aqi_df = daily_avg_aqi_df.groupby(by=['day']).mean()
-    daily_avg_aqi_df = daily_avg_aqi_df.sort_values(
-        by=['day_num']).drop(columns=['day_num']).reset_index()
-    return daily_avg_aqi_df
-
-def create_hourly_avg_aqi_df(df):
-    hourly_avg_aqi_df = df.groupby(by="hour").agg({
-        "PM2.5": "mean",
-        "PM10": "mean"
-    }).reset_index()
-    hourly_avg_aqi_df["hour"] = hourly_avg_aqi_df["hour"].astype(str) + ":00"
-    return hourly_avg_aqi_df
-
-def create_aqi_by_pm2_5_df(df):
-    aqi_by_pm2_5_df = df.groupby(by="AQIBYPM2.5").idx.nunique().reset_index()
-    aqi_by_pm2_5_df.rename(columns={
-        "idx": "aqi_by_pm2_5_count"
-    }, inplace=True)
-    categories = ["Good", "Moderate", "Unhealthy for Sensitive Groups", "Unhealthy", "Very Unhealthy", "Hazardous"]
-    aqi_by_pm2_5_df["AQIBYPM2.5"] = pd.Categorical(
-        aqi_by_pm2_5_df["AQIBYPM2.5"], categories=categories, ordered=True)
-    aqi_by_pm2_5_df.sort_values(by="AQIBYPM2.5").reset_index(drop=True)
-    return aqi_by_pm2_5_df
-
-def create_aqi_by_pm10_df(df):
-    aqi_by_pm10_df = df.groupby(by="AQIBYPM10").idx.nunique().reset_index()
-    aqi_by_pm10_df.rename(columns={
-        "idx": "aqi_by_pm10_count"
-    }, inplace=True)
-    categories = ["Good", "Moderate", "Unhealthy",
-                "Very Unhealthy", "Hazardous"]
-    aqi_by_pm10_df["AQIBYPM10"] = pd.Categorical(
-        aqi_by_pm10_df["AQIBYPM10"], categories=categories, ordered=True)
-    aqi_by_pm10_df.sort_values(by="AQIBYPM10")
-    return aqi_by_pm10_df
-
-def create_agg_df(df, period):
-    agg_df = df.resample(rule=period, on="date_time").agg({
-        "PM2.5": "mean",
-        "PM10": "mean",
-        "SO2": "mean",
-        "NO2": "mean",
-        "CO": "mean",
-    })
-    if period == "M" and len(annual_periods) < 2:
-        agg_df.index = agg_df.index.strftime('%b')
-    else:
-        agg_df.index = agg_df.index.strftime('%Y-%m-%d')
-    agg_df = agg_df.reset_index()
-    agg_df.rename(columns={
-        "PM2.5": "avg_pm2_5",
-        "PM10": "avg_pm10",
-        "SO2": "avg_so2",
-        "NO2": "avg_no2",
-        "CO": "avg_co"
-    }, inplace=True)
-    return agg_df
-
-def create_agg_stats_df(df):
-    agg_stats_df = df.groupby(by="date_time").agg({
-        "SO2": "mean",
-        "NO2": "mean",
-        "CO": "mean"
-    })
-    agg_stats_df = agg_stats_df.reset_index()
-    agg_stats_df.rename(columns={
-        "SO2": "so2_stats",
-        "NO2": "no2_stats",
-        "CO": "co_stats"
-    }, inplace=True)
-    return agg_stats_df
+from loader import load_main_data, load_derived, data_fingerprint, source_fingerprint
+from analytics import (
+    create_avg_aqi_df,
+    create_aqi_stats_df,
+    create_rolling_aqi_df,
+    create_exceedance_df,
+    create_percentile_df,
+    create_percentile_band_df,
+    create_monthly_per_year_avg_aqi_df,
+    create_station_scores_df,
+    create_leaderboard_df,
+    create_daily_avg_aqi_df,
+    create_hourly_avg_aqi_df,
+    create_weekday_hour_profile,
+    create_weekday_hour_df,
+    create_aqi_by_pm2_5_df,
+    create_aqi_by_pm10_df,
+    create_agg_df,
+    create_agg_stats_df,
+    create_correlation_df,
+)
+from rollup import DailyRollup
+from rolling import RollingAqi, exceedance_threshold
+from correlation import CovarianceRollup
+from quantiles import QuantileSketches
+from leaderboard import (
+    LEADERBOARD_SIZE, RANKINGS, SCORE_LABELS, StationLeaderboard, station_rank
+)
+from memo import AggregateCache, disk_store, selection_key
+from disk_cache import DiskCache, cache_dir
+from dataset_index import DatasetIndex, RowView
+from catalog import DatasetCatalog
+from category_counts import CategoryCounts
+from chart_cache import ChartCache, chart_key, render_pool
+from charts import (
+    render_avg_aqi,
+    render_best_worst_aqi,
+    render_daily_avg_aqi,
+    render_hourly_avg_aqi,
+    render_weekday_hour,
+    render_aqi_by_pm2_5,
+    render_aqi_by_pm10,
+    render_agg,
+    render_rolling_aqi,
+    render_correlation,
+)
+from downsample import downsample_rows
+from profiler import RerunProfiler, DEFAULT_LOG_PATH
+from warmup import CacheWarmup, combinations
+from streaming import (
+    iter_chunks, load_partials, select_partials, load_derived as load_partial_derived
+)
+from sql_backend import load_backend, load_derived as load_sql_derived
+# The loaded frame is shared by every session; with copy-on-write no view of
+# it can modify it in place.
+pd.set_option("mode.copy_on_write", True)
 
 def set_checkbox_var(position):
-    return str(all_df.groupby(
-        by="annually_period")["annually_period"].nunique().index[position])
+    return catalog.annual_periods[position]
 
 def set_district_var():
     all_district = ["Semua Distrik"]
-    district_selection = all_df.groupby(
-        by="station")["station"].nunique().sort_values().index.tolist()
-    return all_district + district_selection
+    return all_district + catalog.stations
 
-# all_df = pd.read_csv("dashboard/main_data.csv")
-all_df = pd.read_csv('main_data.csv')
-all_df["date_time"] = pd.to_datetime(all_df["date_time"])
+# Opt-in with ?profile=1 or AQI_PROFILE=1; timings go to the panel at the
+# bottom of the page and to AQI_PROFILE_LOG.
+profiler = RerunProfiler(
+    enabled=bool(st.query_params.get("profile")) or os.environ.get("AQI_PROFILE") == "1",
+    log_path=os.environ.get("AQI_PROFILE_LOG", DEFAULT_LOG_PATH)
+)
 
-min_date = all_df["date_time"].min()
-max_date = all_df["date_time"].max()
+# AQI_STREAMING=1 never holds the rows in memory: each selection is served
+# from partial aggregates folded from a chunked pass over the source.
+streaming_mode = os.environ.get("AQI_STREAMING") == "1"
+# AQI_BACKEND=sql pushes filters and aggregations down to a SQLite copy of
+# the source; the default pandas backend is the reference.
+sql_mode = os.environ.get("AQI_BACKEND") == "sql" and not streaming_mode
+# AQI_WARMUP=1 precomputes every district x period combination in a
+# background process pool when the dataset is first loaded.
+warmup_enabled = os.environ.get("AQI_WARMUP") == "1" and not streaming_mode and not sql_mode
+if warmup_enabled:
+    # Streamlit runs this script as a __main__ module without a spec, so each
+    # spawned worker would first re-run the whole page; a "__main__" spec
+    # tells multiprocessing not to import the main module in workers.
+    __spec__ = ModuleSpec("__main__", None)
+# Charts render on a pool of AQI_CHART_WORKERS threads (default: one per
+# CPU) and are placed in page order; 1 renders them in the script thread.
+chart_workers = int(os.environ.get("AQI_CHART_WORKERS", os.cpu_count() or 1))
+chart_pool = render_pool(chart_workers) if chart_workers > 1 else None
+# Aggregates and charts also persist in AQI_CACHE_DIR (default
+# main_data.cache), up to AQI_CACHE_MB megabytes, so a restart on unchanged
+# data starts hot; AQI_CACHE_MB=0 keeps them in memory only.
+cache_mb = int(os.environ.get("AQI_CACHE_MB", "256"))
+cache_directory = os.environ.get("AQI_CACHE_DIR", cache_dir("main_data.csv"))
+
+def aggregate_store(fingerprint, backend):
+    if cache_mb <= 0:
+        return None
+    return disk_store(cache_directory, fingerprint, backend, cache_mb * 2**20)
+
+def chart_store():
+    if cache_mb <= 0:
+        return None
+    return DiskCache(cache_directory, "charts", cache_mb * 2**20)
+
+with profiler.section("load") as record:
+    if streaming_mode:
+        all_df = load_partials("main_data.csv")
+        catalog = all_df.catalog
+        daily_rollup = load_partial_derived(
+            "daily_rollup",
+            lambda partials: DailyRollup.from_chunks(iter_chunks("main_data.csv"), catalog))
+        category_counts = all_df.counts
+        rolling_aqi = load_partial_derived(
+            "rolling_aqi",
+            lambda partials: RollingAqi.from_chunks(iter_chunks("main_data.csv"), catalog))
+        quantile_sketches = load_partial_derived(
+            "quantile_sketches",
+            lambda partials: QuantileSketches.from_chunks(
+                iter_chunks("main_data.csv"), catalog))
+        covariance = load_partial_derived(
+            "covariance",
+            lambda partials: CovarianceRollup.from_chunks(iter_chunks("main_data.csv"), catalog))
+        aggregate_cache = load_partial_derived(
+            "aggregate_cache", lambda partials: AggregateCache(
+                store=aggregate_store(source_fingerprint("main_data.csv"), "streaming")))
+        chart_cache = load_partial_derived(
+            "chart_cache", lambda partials: ChartCache(store=chart_store()))
+        select_rows = partial(select_partials, "main_data.csv")
+    elif sql_mode:
+        sql_backend = load_backend("main_data.csv")
+        all_df = sql_backend.select()
+        catalog = sql_backend.catalog
+        daily_rollup = sql_backend
+        category_counts = all_df
+        rolling_aqi = load_sql_derived(
+            "rolling_aqi",
+            lambda backend: RollingAqi.from_chunks(iter_chunks("main_data.csv"), catalog))
+        quantile_sketches = load_sql_derived(
+            "quantile_sketches",
+            lambda backend: QuantileSketches.from_chunks(
+                iter_chunks("main_data.csv"), catalog))
+        covariance = load_sql_derived(
+            "covariance",
+            lambda backend: CovarianceRollup.from_chunks(iter_chunks("main_data.csv"), catalog))
+        aggregate_cache = load_sql_derived(
+            "aggregate_cache", lambda backend: AggregateCache(
+                store=aggregate_store(source_fingerprint("main_data.csv"), "sql")))
+        chart_cache = load_sql_derived("chart_cache", lambda backend: ChartCache(store=chart_store()))
+        select_rows = sql_backend.select
+    else:
+        # all_df = pd.read_csv("dashboard/main_data.csv")
+        all_df = load_main_data("main_data.csv")
+        catalog = load_derived("catalog", DatasetCatalog.from_frame)
+        data_index = load_derived("dataset_index", DatasetIndex.from_frame)
+        daily_rollup = load_derived("daily_rollup", DailyRollup.from_frame)
+        category_counts = load_derived("category_counts", CategoryCounts.from_frame)
+        rolling_aqi = load_derived("rolling_aqi", RollingAqi.from_frame)
+        quantile_sketches = load_derived("quantile_sketches", QuantileSketches.from_frame)
+        covariance = load_derived("covariance", CovarianceRollup.from_frame)
+        # A warmed cache holds 41 or 42 aggregates per combination, about
+        # 3,300 for the 78 combinations of the Beijing set.
+        aggregate_cache = load_derived(
+            "aggregate_cache", lambda df: AggregateCache(
+                maxsize=4096 if warmup_enabled else 256,
+                store=aggregate_store(data_fingerprint("main_data.csv"), "pandas")))
+        chart_cache = load_derived("chart_cache", lambda df: ChartCache(store=chart_store()))
+        select_rows = data_index.view
+        if warmup_enabled:
+            warmup = load_derived(
+                "cache_warmup",
+                lambda df: CacheWarmup(aggregate_cache, combinations(catalog)).start())
+    record["rows_out"] = len(all_df)
+profiler.context["dataset_rows"] = len(all_df)
+
+min_date = catalog.min_date
+max_date = catalog.max_date
 annual_periods = []
-annual_period_count = all_df["annually_period"].nunique()
+annual_period_count = len(catalog.annual_periods)
 district = "Semua Distrik"
-districts_count = all_df["station"].nunique()
+districts_count = len(catalog.stations)
 all_district_df = all_df
 start_date = min_date
 end_date = max_date
+selection = {}
+row_filter = {}
 
-with st.sidebar:
+with st.sidebar, profiler.section("filter", rows_in=len(all_df)) as filter_record:
     st.caption("Filter Data Berdasarkan:")
     period = st.selectbox(
         label="Pilih Periode",
@@ -179,8 +199,7 @@ with st.sidebar:
     )
     if period == "Seluruh Periode (2013-2017)":
         annual_periods = ["", ""]
-        main_df = all_df[(all_df["date_time"] >= min_date) &
-                        (all_df["date_time"] <= max_date)]
+        main_df = all_df
         all_district_df = main_df
     elif period == "Rentang Waktu Tertentu":
         annual_periods = ["", ""]
@@ -192,12 +211,12 @@ with st.sidebar:
         )
         if isinstance(selected_date_range, tuple) and len(selected_date_range) == 2:
             start_date, end_date = list(selected_date_range)
-            main_df = all_df[(all_df["date_time"] >= str(start_date)) & (
-                all_df["date_time"] <= str(end_date))]
+            row_filter = {"start": start_date, "end": end_date + timedelta(days=1)}
+            main_df = select_rows(**row_filter)
+            selection = {"start": start_date, "end": end_date}
         else:
             st.warning("Silahkan pilih rentang waktu yang valid.")
-            main_df = all_df[(all_df["date_time"] >= min_date)
-                            & (all_df["date_time"] <= max_date)]
+            main_df = all_df
         all_district_df = main_df
     else:
         annual_periods = []
@@ -206,16 +225,13 @@ with st.sidebar:
                 i).replace("(", "").replace(")", ""), key=i+9)
             if period:
                 annual_periods.append(set_checkbox_var(i))
+        row_filter = {"annual_periods": annual_periods}
+        main_df = select_rows(**row_filter)
         if annual_periods == []:
-            main_df = all_df[all_df["annually_period"].astype(
-                str) == ""]
             st.warning("Silahkan pilih minimal satu periode tahunan.")
         else:
-            start_date = annual_periods[0].split(" - ")[0].replace("(", "")
-            end_date = annual_periods[len(
-                annual_periods)-1].split(" - ")[1].replace(")", "")
-            main_df = all_df[all_df["annually_period"].astype(
-                str).str.contains("|".join(annual_periods))]
+            start_date, end_date = catalog.period_dates(annual_periods)
+        selection = {"annual_periods": annual_periods}
         all_district_df = main_df
     district = st.selectbox(
         label="Pilih Distrik",
@@ -223,9 +239,84 @@ with st.sidebar:
         key=0
     )
     if district != "Semua Distrik":
-        main_df = main_df[main_df["station"] == district]
+        main_df = select_rows(district, **row_filter)
+        selection["station"] = district
     else:
         main_df = all_district_df
+    filter_record["rows_out"] = len(main_df)
+    if warmup_enabled:
+        if not warmup.finished:
+            st.progress(warmup.done / warmup.total,
+                        text=f"Cache warm-up: {warmup.done}/{warmup.total} combinations")
+        else:
+            st.caption(
+                f"Cache warm-up: {warmup.aggregates} aggregates for {warmup.done} "
+                f"combinations in {warmup.elapsed:.1f} s ({warmup.reused} from disk)")
+    if st.query_params.get("debug"):
+        cache_stats = aggregate_cache.stats()
+        st.caption(
+            f"Aggregate cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+            f"{cache_stats['size']}/{cache_stats['maxsize']} entries")
+        chart_stats = chart_cache.stats()
+        st.caption(
+            f"Chart cache: {chart_stats['hits']} hits, {chart_stats['misses']} misses, "
+            f"{chart_stats['bytes'] // 1024} KiB in {chart_stats['size']} images")
+        if aggregate_cache.store is not None:
+            disk_stats = aggregate_cache.store.stats()
+            st.caption(
+                f"Disk cache: {disk_stats['hits']} hits, {disk_stats['misses']} misses, "
+                f"{disk_stats['bytes'] // 2**20} MiB in {disk_stats['size']} entries")
+
+filter_key = selection_key(selection)
+
+def compute_on_rows(create, *args):
+    # Row views are gathered only on a cache miss and dropped right after.
+    return create(*(arg.rows() if isinstance(arg, RowView) else arg for arg in args))
+
+def memo(create, *args, params=()):
+    rows_in = len(args[0]) if isinstance(args[0], (pd.DataFrame, RowView)) else None
+    with profiler.section(f"aggregate.{create.__name__}", rows_in) as record:
+        result = aggregate_cache.get_or_compute(
+            (create.__name__, filter_key) + params, compute_on_rows, create, *args)
+        record["rows_out"] = len(result)
+    return result
+
+# Downsampling per line chart: "lttb", "minmax" (min/max envelope) or None
+# to plot every point.
+chart_downsampling = {
+    "avg_aqi": "lttb",
+    "rolling_aqi": "lttb",
+    "agg": "minmax",
+}
+
+# Placeholders of submitted charts, filled in order by emit_charts. A full
+# run emits at the end of the page so every chart renders concurrently; a
+# fragment rerun emits at the end of its fragment.
+pending_charts = []
+page_running = True
+
+def show_chart(render, *args):
+    rows_in = next((len(arg) for arg in args if isinstance(arg, pd.DataFrame)), None)
+    key = chart_key(render.__name__, *args)
+    timer = partial(profiler.section, f"render.{render.__name__}", rows_in)
+    if chart_pool is None:
+        with timer():
+            st.image(chart_cache.get_or_render(key, render, *args), width="stretch")
+    else:
+        # Timed on the worker, so render.<name> holds the Matplotlib work and
+        # render.emit only the wait for it; cached charts are not timed.
+        pending_charts.append(
+            (st.empty(), chart_cache.submit(chart_pool, key, render, *args, timer=timer)))
+
+def emit_charts():
+    with profiler.section("render.emit", len(pending_charts)):
+        while pending_charts:
+            placeholder, image = pending_charts.pop(0)
+            placeholder.image(image.result(), width="stretch")
+
+def emit_fragment_charts():
+    if not page_running:
+        emit_charts()
 
 st.title("Air Quality Dashboard")
 st.header("Air Quality Index (AQI) in Districs of Tiongkok")
@@ -237,494 +328,426 @@ with pm2_5_metrics:
 with pm10_metrics:
     st.markdown("<h3 style='text-align: center;'>PM10 (μg/m³)</h3>",
                 unsafe_allow_html=True)
+aqi_stats_df = memo(create_aqi_stats_df, main_df)
 with pm2_5_metrics:
     avg_pm2_5_col, min_pm2_5_col, max_pm2_5_col = st.columns(3)
     with avg_pm2_5_col:
-        avg_aqi_by_pm2_5 = create_aqi_stats_df(
-            main_df).pm2_5_stats["mean"].mean()
+        avg_aqi_by_pm2_5 = aqi_stats_df.pm2_5_stats["mean"].mean()
         st.metric("Average", value=round(avg_aqi_by_pm2_5, 1))
     with min_pm2_5_col:
-        min_aqi_by_pm2_5 = create_aqi_stats_df(
-            main_df).pm2_5_stats["min"].min()
+        min_aqi_by_pm2_5 = aqi_stats_df.pm2_5_stats["min"].min()
         st.metric("Min", value=round(min_aqi_by_pm2_5, 1))
     with max_pm2_5_col:
-        max_aqi_by_pm2_5 = create_aqi_stats_df(
-            main_df).pm2_5_stats["max"].max()
+        max_aqi_by_pm2_5 = aqi_stats_df.pm2_5_stats["max"].max()
         st.metric("Max", value=round(max_aqi_by_pm2_5, 1))
 with pm10_metrics:
     avg_pm10_col, min_pm10_col, max_pm10_col = st.columns(3)
     with avg_pm10_col:
-        avg_aqi_by_pm10 = create_aqi_stats_df(
-            main_df).pm10_stats["mean"].mean()
+        avg_aqi_by_pm10 = aqi_stats_df.pm10_stats["mean"].mean()
         st.metric("Average", value=round(avg_aqi_by_pm10, 1))
     with min_pm10_col:
-        min_aqi_by_pm10 = create_aqi_stats_df(main_df).pm10_stats["min"].min()
+        min_aqi_by_pm10 = aqi_stats_df.pm10_stats["min"].min()
         st.metric("Min", value=round(min_aqi_by_pm10, 1))
     with max_pm10_col:
-        max_aqi_by_pm10 = create_aqi_stats_df(main_df).pm10_stats["max"].max()
+        max_aqi_by_pm10 = aqi_stats_df.pm10_stats["max"].max()
         st.metric("Max", value=round(max_aqi_by_pm10, 1))
 
-daily_tab, monthly_tab, quarterly_tab, semester_tab = st.tabs(
-    ["Daily", "Monthly", "Quarterly", "Semester"]
-)
-
-pm2_5_var = "PM2.5"
-pm10_var = "PM10"
-selected_period = "D"
-date_plt_title = "per-Day"
-
-def plot_avg_aqi_pm2_5(ax, period):
+# Percentiles of the hourly readings, from the quantile sketches.
+percentile_df = memo(create_percentile_df, quantile_sketches, selection)
+for pollutant, metrics_col in [("PM2.5", pm2_5_metrics), ("PM10", pm10_metrics)]:
+    percentiles = percentile_df.loc[pollutant]
+    with metrics_col:
+        for percentile_col, (name, value) in zip(st.columns(len(percentiles)), percentiles.items()):
+            with percentile_col:
+                st.metric(name.upper(), value=round(value, 1))
+
+# 24-hour averages and NowCast, per pollutant, under its concentration tiles.
+exceedance_df = memo(create_exceedance_df, rolling_aqi, selection)
+for pollutant, metrics_col in [("PM2.5", pm2_5_metrics), ("PM10", pm10_metrics)]:
+    exceedance = exceedance_df.loc[pollutant]
+    with metrics_col:
+        max_24h_col, exceedance_col, nowcast_col = st.columns(3)
+        with max_24h_col:
+            st.metric("Max 24h Avg", value=round(exceedance["max_24h"], 1))
+        with exceedance_col:
+            st.metric(f"Hours > {exceedance['threshold']:g}",
+                      value=int(exceedance["exceedance_hours"]))
+        with nowcast_col:
+            st.metric("NowCast AQI", value=f"{exceedance['nowcast_aqi']:.0f}")
+
+def plot_avg_aqi(period, pm2_5_var, pm10_var, date_plt_title):
+    if main_df.empty:
+        st.warning("Tidak ada data untuk ditampilkan.")
+        return
+    avg_aqi_df = memo(create_avg_aqi_df, daily_rollup, selection, period,
+                      params=(period,))
     if period == "M" and len(annual_periods) < 2:
-        x_axis = create_monthly_per_year_avg_aqi_df(main_df)['month']
+        x_axis = memo(create_monthly_per_year_avg_aqi_df, daily_rollup, selection)['month']
     else:
-        x_axis = create_avg_aqi_df(main_df, period)['date_time']
-    ax.plot(
-        x_axis,
-        create_avg_aqi_df(main_df, period)['avg_pm2_5'],
-        linewidth=2,
-        marker='o',
-        label='PM2.5',
-        color='brown'
+        x_axis = avg_aqi_df['date_time']
+    band_df = memo(create_percentile_band_df, quantile_sketches, selection, period,
+                   params=(period,))
+    band_df = band_df.set_index("date_time").reindex(avg_aqi_df["date_time"]).reset_index()
+    rows = downsample_rows(avg_aqi_df, ["avg_pm2_5", "avg_pm10"],
+                           method=chart_downsampling["avg_aqi"])
+    avg_aqi_df = avg_aqi_df.iloc[rows]
+    band_df = band_df.iloc[rows]
+    x_axis = x_axis.iloc[rows]
+    show_chart(render_avg_aqi, x_axis, avg_aqi_df, pm2_5_var, pm10_var, date_plt_title,
+               band_df)
+
+# Each section is a fragment: its widgets rerun only that section, and the
+# tabs track which one is open so hidden tabs are not computed.
+@st.fragment
+def avg_aqi_section():
+    daily_tab, monthly_tab, quarterly_tab, semester_tab = st.tabs(
+        ["Daily", "Monthly", "Quarterly", "Semester"],
+        key="avg_aqi_tabs",
+        on_change="rerun"
     )
+    with daily_tab:
+        if daily_tab.open:
+            daily_date_periods = pd.period_range(
+                str(start_date), str(end_date), freq="D")
+            if len(daily_date_periods) > 6:
+                st.subheader("Daily")
+                selected_period = "D"
+                date_plt_title = "per-Day"
+                pm2_5_col, pm10_col = st.columns(2)
+                with pm2_5_col:
+                    is_pm2_5 = st.checkbox("PM2.5", value=True, key=1)
+                with pm10_col:
+                    is_pm10 = st.checkbox("PM10", value=True, key=2)
+                if is_pm2_5 or is_pm10:
+                    pm2_5_var = "PM2.5" if is_pm2_5 else ""
+                    pm10_var = "PM10" if is_pm10 else ""
+                    plot_avg_aqi(selected_period, pm2_5_var, pm10_var, date_plt_title)
+                else:
+                    st.warning("Silakan pilih minimal satu variabel untuk ditampilkan")
+            else:
+                st.warning("Silakan pilih rentang waktu minimal satu minggu.")
+    with monthly_tab:
+        if monthly_tab.open:
+            monthly_date_periods = pd.period_range(
+                str(start_date), str(end_date), freq="M")
+            if len(monthly_date_periods) > 3:
+                st.subheader("Monthly")
+                selected_period = "M"
+                date_plt_title = "per-Month"
+                pm2_5_col, pm10_col = st.columns(2)
+                with pm2_5_col:
+                    is_pm2_5 = st.checkbox("PM2.5", value=True, key=3)
+                with pm10_col:
+                    is_pm10 = st.checkbox("PM10", value=True, key=4)
+                if is_pm2_5 or is_pm10:
+                    pm2_5_var = "PM2.5" if is_pm2_5 else ""
+                    pm10_var = "PM10" if is_pm10 else ""
+                    plot_avg_aqi(selected_period, pm2_5_var, pm10_var, date_plt_title)
+                else:
+                    st.warning("Silakan pilih minimal satu variabel untuk ditampilkan.")
+            else:
+                st.warning("Silakan pilih rentang waktu minimal satu caturwulan.")
+    with quarterly_tab:
+        if quarterly_tab.open:
+            quarterly_date_periods = pd.period_range(
+                str(start_date), str(end_date), freq="Q")
+            if len(quarterly_date_periods) > 3:
+                st.subheader("Quarterly")
+                selected_period = "Q"
+                date_plt_title = "per-Quarter"
+                pm2_5_col, pm10_col = st.columns(2)
+                with pm2_5_col:
+                    is_pm2_5 = st.checkbox("PM2.5", value=True, key=5)
+                with pm10_col:
+                    is_pm10 = st.checkbox("PM10", value=True, key=6)
+                if is_pm2_5 or is_pm10:
+                    pm2_5_var = "PM2.5" if is_pm2_5 else ""
+                    pm10_var = "PM10" if is_pm10 else ""
+                    plot_avg_aqi(selected_period, pm2_5_var, pm10_var, date_plt_title)
+                else:
+                    st.warning("Silakan pilih minimal satu variabel untuk ditampilkan.")
+            else:
+                st.warning("Silakan pilih rentang waktu minimal satu tahun.")
+    with semester_tab:
+        if semester_tab.open:
+            if pd.to_datetime(end_date) - pd.to_datetime(start_date) >= max_date - min_date - timedelta(days=1):
+                st.subheader("Semester")
+                selected_period = "6M"
+                date_plt_title = "per-Semester"
+                pm2_5_col, pm10_col = st.columns(2)
+                with pm2_5_col:
+                    is_pm2_5 = st.checkbox("PM2.5", value=True, key=7)
+                with pm10_col:
+                    is_pm10 = st.checkbox("PM10", value=True, key=8)
+                if is_pm2_5 or is_pm10:
+                    pm2_5_var = "PM2.5" if is_pm2_5 else ""
+                    pm10_var = "PM10" if is_pm10 else ""
+                    plot_avg_aqi(selected_period, pm2_5_var, pm10_var, date_plt_title)
+                else:
+                    st.warning("Silakan pilih minimal satu variabel untuk ditampilkan.")
+            else:
+                st.warning("Silakan pilih rentang waktu pada semua periode.")
+    emit_fragment_charts()
+
+avg_aqi_section()
+
+st.subheader("24-hour Average and NowCast")
+
+def plot_rolling_aqi(pollutant):
+    if main_df.empty:
+        st.warning("Tidak ada data untuk ditampilkan.")
+        return
+    rolling_aqi_df = memo(create_rolling_aqi_df, rolling_aqi, selection, pollutant,
+                          params=(pollutant,))
+    rows = downsample_rows(rolling_aqi_df, ["rolling_24h", "nowcast"],
+                           method=chart_downsampling["rolling_aqi"])
+    show_chart(render_rolling_aqi, rolling_aqi_df.iloc[rows], pollutant,
+               exceedance_threshold(pollutant))
+
+@st.fragment
+def rolling_aqi_section():
+    pollutant = st.selectbox(
+        label="Pilih Parameter",
+        options=["PM2.5", "PM10"],
+        key="rolling_aqi_pollutant"
+    )
+    plot_rolling_aqi(pollutant)
+    emit_fragment_charts()
 
-def plot_avg_aqi_pm10(ax, period):
-    if period == "M" and len(annual_periods) < 2:
-        x_axis = create_monthly_per_year_avg_aqi_df(main_df)['month']
-    else:
-        x_axis = create_avg_aqi_df(main_df, period)['date_time']
-    ax.plot(
-        x_axis,
-        create_avg_aqi_df(main_df, period)['avg_pm10'],
-        linewidth=2,
-        marker='o',
-        label='PM10',
-        color='orange'
+rolling_aqi_section()
+
+st.subheader("Best & Worst AQI in Tiongkok Districs")
+
+# Stations are scored from per-station aggregates and ranked among all
+# stations for the selected dates; a selected district shows its rank.
+leaderboard = StationLeaderboard(daily_rollup, quantile_sketches, rolling_aqi)
+
+def plot_leaderboard(ranking):
+    scores_df = memo(create_station_scores_df, leaderboard, selection, ranking,
+                     params=(ranking,))
+    if scores_df.empty:
+        st.warning("Tidak ada data untuk ditampilkan.")
+        return
+    if district != "Semua Distrik":
+        rank = station_rank(scores_df["score"], district)
+        st.metric(f"Rank of {district} by {ranking}",
+                  value="-" if rank is None else f"{rank} / {len(scores_df)}",
+                  help="1 is the most polluted station.")
+    leaderboard_df = memo(create_leaderboard_df, scores_df, LEADERBOARD_SIZE,
+                          params=(ranking, LEADERBOARD_SIZE))
+    show_chart(render_best_worst_aqi, leaderboard_df, ranking,
+               SCORE_LABELS[RANKINGS[ranking][0]])
+
+@st.fragment
+def leaderboard_section():
+    ranking = st.selectbox(
+        label="Pilih Peringkat",
+        options=list(RANKINGS),
+        key="leaderboard_ranking"
     )
+    plot_leaderboard(ranking)
+    emit_fragment_charts()
 
-def plot_avg_aqi(period):
+leaderboard_section()
+
+st.subheader("Best & Worst Time AQI by PM2.5 & PM10")
+st.markdown("* #### Best & Worst AQI Time per-Day")
+
+def plot_daily_avg_aqi(pm2_5_var, pm10_var):
     if main_df.empty:
         st.warning("Tidak ada data untuk ditampilkan.")
         return
-    fig, ax = plt.subplots(figsize=(10, 7))
-    plt.grid(zorder=0)
-    plt.ylabel("Concentration (μg/m³)")
-    if pm2_5_var == "PM2.5":
-        plot_avg_aqi_pm2_5(ax, period)
-    if pm10_var == "PM10":
-        plot_avg_aqi_pm10(ax, period)
-    plt.legend()
-    concatenation = ""
-    if pm2_5_var == "PM2.5" and pm10_var == "PM10":
-        concatenation = " and "
-    else:
-        concatenation = ""
-    plt.title(
-        f"Average Number of {pm2_5_var}{concatenation}{pm10_var} {date_plt_title}")
-    st.pyplot(fig)
+    profile = memo(create_weekday_hour_profile, main_df)
+    daily_avg_aqi_df = memo(create_daily_avg_aqi_df, profile)
+    show_chart(render_daily_avg_aqi, daily_avg_aqi_df, pm2_5_var, pm10_var)
 
-with daily_tab:
+@st.fragment
+def daily_avg_aqi_section():
     daily_date_periods = pd.period_range(
         str(start_date), str(end_date), freq="D")
     if len(daily_date_periods) > 6:
-        st.subheader("Daily")
-        selected_period = "D"
-        date_plt_title = "per-Day"
-        pm2_5_col, pm10_col = st.columns(2)
-        with pm2_5_col:
-            is_pm2_5 = st.checkbox("PM2.5", value=True, key=1)
-        with pm10_col:
-            is_pm10 = st.checkbox("PM10", value=True, key=2)
-        if is_pm2_5 or is_pm10:
-            pm2_5_var = "PM2.5" if is_pm2_5 else ""
-            pm10_var = "PM10" if is_pm10 else ""
-            plot_avg_aqi(selected_period)
-        else:
-            st.warning("Silakan pilih minimal satu variabel untuk ditampilkan")
-    else:
-        st.warning("Silakan pilih rentang waktu minimal satu minggu.")
-with monthly_tab:
-    monthly_date_periods = pd.period_range(
-        str(start_date), str(end_date), freq="M")
-    if len(monthly_date_periods) > 3:
-        st.subheader("Monthly")
-        selected_period = "M"
-        date_plt_title = "per-Month"
-        pm2_5_col, pm10_col = st.columns(2)
-        with pm2_5_col:
-            is_pm2_5 = st.checkbox("PM2.5", value=True, key=3)
-        with pm10_col:
-            is_pm10 = st.checkbox("PM10", value=True, key=4)
-        if is_pm2_5 or is_pm10:
-            pm2_5_var = "PM2.5" if is_pm2_5 else ""
-            pm10_var = "PM10" if is_pm10 else ""
-            plot_avg_aqi(selected_period)
-        else:
-            st.warning("Silakan pilih minimal satu variabel untuk ditampilkan.")
-    else:
-        st.warning("Silakan pilih rentang waktu minimal satu caturwulan.")
-with quarterly_tab:
-    quarterly_date_periods = pd.period_range(
-        str(start_date), str(end_date), freq="Q")
-    if len(quarterly_date_periods) > 3:
-        st.subheader("Quarterly")
-        selected_period = "Q"
-        date_plt_title = "per-Quarter"
         pm2_5_col, pm10_col = st.columns(2)
         with pm2_5_col:
-            is_pm2_5 = st.checkbox("PM2.5", value=True, key=5)
+            is_pm2_5 = st.checkbox("PM2.5", value=True, key=14)
         with pm10_col:
-            is_pm10 = st.checkbox("PM10", value=True, key=6)
+            is_pm10 = st.checkbox("PM10", value=True, key=15)
         if is_pm2_5 or is_pm10:
             pm2_5_var = "PM2.5" if is_pm2_5 else ""
             pm10_var = "PM10" if is_pm10 else ""
-            plot_avg_aqi(selected_period)
+            plot_daily_avg_aqi(pm2_5_var, pm10_var)
         else:
             st.warning("Silakan pilih minimal satu variabel untuk ditampilkan.")
     else:
-        st.warning("Silakan pilih rentang waktu minimal satu tahun.")
-with semester_tab:
-    if pd.to_datetime(end_date) - pd.to_datetime(start_date) >= max_date - min_date - timedelta(days=1):
-        st.subheader("Semester")
-        selected_period = "6M"
-        date_plt_title = "per-Semester"
+        st.warning("Silakan pilih rentang waktu minimal seminggu.")
+    emit_fragment_charts()
+
+daily_avg_aqi_section()
+
+st.markdown("* #### Best & Worst AQI Time per-Hour")
+
+def plot_hourly_avg_aqi(pm2_5_var, pm10_var):
+    if main_df.empty:
+        st.warning("Tidak ada data untuk ditampilkan.")
+        return
+    profile = memo(create_weekday_hour_profile, main_df)
+    hourly_avg_aqi_df = memo(create_hourly_avg_aqi_df, profile)
+    show_chart(render_hourly_avg_aqi, hourly_avg_aqi_df, pm2_5_var, pm10_var)
+
+@st.fragment
+def hourly_avg_aqi_section():
+    daily_date_periods = pd.period_range(
+        str(start_date), str(end_date), freq="D")
+    if len(daily_date_periods) > 0:
         pm2_5_col, pm10_col = st.columns(2)
         with pm2_5_col:
-            is_pm2_5 = st.checkbox("PM2.5", value=True, key=7)
+            is_pm2_5 = st.checkbox("PM2.5", value=True, key=16)
         with pm10_col:
-            is_pm10 = st.checkbox("PM10", value=True, key=8)
+            is_pm10 = st.checkbox("PM10", value=True, key=17)
         if is_pm2_5 or is_pm10:
             pm2_5_var = "PM2.5" if is_pm2_5 else ""
             pm10_var = "PM10" if is_pm10 else ""
-            plot_avg_aqi(selected_period)
+            plot_hourly_avg_aqi(pm2_5_var, pm10_var)
         else:
             st.warning("Silakan pilih minimal satu variabel untuk ditampilkan.")
     else:
-        st.warning("Silakan pilih rentang waktu pada semua periode.")
+        st.warning("Silakan pilih rentang waktu minimal satu hari.")
+    emit_fragment_charts()
 
-st.subheader("Best & Worst AQI in Tiongkok Districs")
-st.markdown("* #### Best & Worst AQI by Average of PM2.5 Parameter")
-colors = ["yellow", "lightgrey", "lightgrey",
-          "lightgrey", "lightgrey", "green"]
-if main_df.empty or district != "Semua Distrik":
-    st.warning("Tidak ada data untuk ditampilkan. Silakan pilih semua distrik.")
-else:
-    fig, ax = plt.subplots(nrows=1, ncols=2, figsize=(20, 8))
-    sns.barplot(
-        x="avg_pm2_5",
-        y="station",
-        data=create_avg_aqi_by_station_df(main_df).sort_values("avg_pm2_5", ascending=False).head(), palette=colors, ax=ax[0]
-    )
-    ax[0].set_title("Worst AQI by PM2.5", fontsize=20)
-    ax[0].set_xlabel("Concentration (μg/m³)", fontsize=16)
-    ax[0].set_ylabel(None)
-    ax[0].tick_params(labelsize=15)
-    sns.barplot(
-        x="avg_pm2_5",
-        y="station",
-        data=create_avg_aqi_by_station_df(main_df).sort_values(by="avg_pm2_5").head(), palette=reversed(colors), ax=ax[1]
-    )
-    ax[1].set_title("Best AQI by PM2.5", fontsize=20)
-    ax[1].set_xlabel("Concentration (μg/m³)", fontsize=16)
-    ax[1].invert_xaxis()
-    ax[1].yaxis.set_label_position("right")
-    ax[1].yaxis.tick_right()
-    ax[1].set_ylabel(None)
-    ax[1].tick_params(labelsize=15)
-    plt.suptitle("Worst and Best AQI by PM2.5", fontsize=24)
-    st.pyplot(fig)
-
-st.markdown("* #### Best & Worst AQI by Average of PM10 Parameter")
-if main_df.empty or district != "Semua Distrik":
-    st.warning("Tidak ada data untuk ditampilkan. Silakan pilih semua distrik.")
-else:
-    fig, ax = plt.subplots(nrows=1, ncols=2, figsize=(20, 8))
-    sns.barplot(
-        x="avg_pm10",
-        y="station",
-        data=create_avg_aqi_by_station_df(main_df).sort_values("avg_pm10", ascending=False).head(), palette=colors, ax=ax[0]
-    )
-    ax[0].set_title("Worst AQI by PM10", fontsize=20)
-    ax[0].set_xlabel("Concentration (μg/m³)", fontsize=16)
-    ax[0].set_ylabel(None)
-    ax[0].tick_params(labelsize=15)
-    sns.barplot(
-        x="avg_pm10",
-        y="station",
-        data=create_avg_aqi_by_station_df(main_df).sort_values(by="avg_pm10").head(), palette=reversed(colors), ax=ax[1]
-    )
-    ax[1].set_title("Best AQI by PM10", fontsize=20)
-    ax[1].set_xlabel("Concentration (μg/m³)", fontsize=16)
-    ax[1].invert_xaxis()
-    ax[1].yaxis.set_label_position("right")
-    ax[1].yaxis.tick_right()
-    ax[1].set_ylabel(None)
-    ax[1].tick_params(labelsize=15)
-    plt.suptitle("Worst and Best AQI by PM10", fontsize=24)
-    st.pyplot(fig)
+hourly_avg_aqi_section()
 
-st.subheader("Best & Worst Time AQI by PM2.5 & PM10")
-st.markdown("* #### Best & Worst AQI Time per-Day")
+st.markdown("* #### Best & Worst AQI Time per-Day and Hour")
 
-def plot_daily_avg_aqi():
+def plot_weekday_hour(pollutant):
     if main_df.empty:
         st.warning("Tidak ada data untuk ditampilkan.")
         return
-    fig, ax = plt.subplots(figsize=(10, 7))
-    plt.grid(zorder=0)
-    plt.ylabel("Concentration (μg/m³)")
-    if pm2_5_var == "PM2.5":
-        ax.plot(
-            create_daily_avg_aqi_df(main_df)['day'],
-            create_daily_avg_aqi_df(main_df)['avg_pm2_5'],
-            linewidth=2,
-            marker='o',
-            label='PM2.5',
-            color='brown')
-    if pm10_var == "PM10":
-        ax.plot(
-            create_daily_avg_aqi_df(main_df)['day'],
-            create_daily_avg_aqi_df(main_df)['avg_pm10'],
-            linewidth=2,
-            marker='o',
-            label='PM10',
-            color='orange')
-    plt.legend()
-    concatenation = ""
-    if pm2_5_var == "PM2.5" and pm10_var == "PM10":
-        concatenation = " and "
-    else:
-        concatenation = ""
-    plt.title(
-        f"Average Number of {pm2_5_var}{concatenation}{pm10_var} per-Day")
-    st.pyplot(fig)
-
-daily_date_periods = pd.period_range(
-    str(start_date), str(end_date), freq="D")
-if len(daily_date_periods) > 6:
-    pm2_5_col, pm10_col = st.columns(2)
-    with pm2_5_col:
-        is_pm2_5 = st.checkbox("PM2.5", value=True, key=14)
-    with pm10_col:
-        is_pm10 = st.checkbox("PM10", value=True, key=15)
-    if is_pm2_5 or is_pm10:
-        pm2_5_var = "PM2.5" if is_pm2_5 else ""
-        pm10_var = "PM10" if is_pm10 else ""
-        plot_daily_avg_aqi()
-    else:
-        st.warning("Silakan pilih minimal satu variabel untuk ditampilkan.")
-else:
-    st.warning("Silakan pilih rentang waktu minimal seminggu.")
-
-st.markdown("* #### Best & Worst AQI Time per-Hour")
+    profile = memo(create_weekday_hour_profile, main_df)
+    weekday_hour_df = memo(create_weekday_hour_df, profile, pollutant,
+                           params=(pollutant,))
+    show_chart(render_weekday_hour, weekday_hour_df, pollutant)
+
+@st.fragment
+def weekday_hour_section():
+    pollutant = st.selectbox(
+        label="Pilih Parameter",
+        options=["PM2.5", "PM10", "SO2", "NO2", "CO"],
+        key="weekday_hour_pollutant"
+    )
+    plot_weekday_hour(pollutant)
+    emit_fragment_charts()
 
-def plot_hourly_avg_aqi():
-    if main_df.empty:
-        st.warning("Tidak ada data untuk ditampilkan.")
-        return
-    fig, ax = plt.subplots(figsize=(10, 7))
-    plt.grid(zorder=0)
-    plt.ylabel("Concentration (μg/m³)")
-    plt.xticks(rotation=45)
-    if pm2_5_var == "PM2.5":
-        ax.plot(
-            create_hourly_avg_aqi_df(main_df)['hour'],
-            create_hourly_avg_aqi_df(main_df)['PM2.5'],
-            linewidth=2,
-            marker='o',
-            label='PM2.5',
-            color='brown')
-    if pm10_var == "PM10":
-        ax.plot(
-            create_hourly_avg_aqi_df(main_df)['hour'],
-            create_hourly_avg_aqi_df(main_df)['PM10'],
-            linewidth=2,
-            marker='o',
-            label='PM10',
-            color='orange')
-    plt.legend()
-    concatenation = ""
-    if pm2_5_var == "PM2.5" and pm10_var == "PM10":
-        concatenation = " and "
-    else:
-        concatenation = ""
-    plt.title(
-        f"Average Number of {pm2_5_var}{concatenation}{pm10_var} per-Hour")
-    st.pyplot(fig)
-
-daily_date_periods = pd.period_range(
-    str(start_date), str(end_date), freq="D")
-if len(daily_date_periods) > 0:
-    pm2_5_col, pm10_col = st.columns(2)
-    with pm2_5_col:
-        is_pm2_5 = st.checkbox("PM2.5", value=True, key=16)
-    with pm10_col:
-        is_pm10 = st.checkbox("PM10", value=True, key=17)
-    if is_pm2_5 or is_pm10:
-        pm2_5_var = "PM2.5" if is_pm2_5 else ""
-        pm10_var = "PM10" if is_pm10 else ""
-        plot_hourly_avg_aqi()
-    else:
-        st.warning("Silakan pilih minimal satu variabel untuk ditampilkan.")
-else:
-    st.warning("Silakan pilih rentang waktu minimal satu hari.")
+weekday_hour_section()
 
 st.subheader("AQI Demographics")
+# Unfiltered counts come from the per-load bitmaps, kept current by ingestion.
+category_source = main_df if selection else category_counts
 st.markdown("* #### Number of AQI Categories by PM2.5")
 
-def set_custom_palette(counts, colors):
-    max_count = counts.max()
-    palettes = [colors[1] if count == max_count else colors[0]
-                for count in counts]
-    return palettes
-
 if main_df.empty:
     st.warning("Tidak ada data untuk ditampilkan.")
 else:
     color_list = ["lightgrey", "brown"]
-    fig, ax = plt.subplots(figsize=(15, 5))
-    sns.barplot(
-        y="aqi_by_pm2_5_count",
-        x="AQIBYPM2.5",
-        data=create_aqi_by_pm2_5_df(main_df),
-        palette=set_custom_palette(create_aqi_by_pm2_5_df(main_df).sort_values(by="AQIBYPM2.5")[
-                                   "aqi_by_pm2_5_count"], color_list)
-    )
-    plt.title("Number of AQI Categories by PM2.5", fontsize=20)
-    plt.xlabel("Categories", fontsize=15)
-    plt.ylabel(None)  # type: ignore
-    st.pyplot(fig)
+    aqi_by_pm2_5_df = memo(create_aqi_by_pm2_5_df, category_source)
+    show_chart(render_aqi_by_pm2_5, aqi_by_pm2_5_df, color_list)
 
 st.markdown("* #### Number of AQI Categories by PM10")
+
 if main_df.empty:
     st.warning("Tidak ada data untuk ditampilkan.")
 else:
     color_list = ["lightgrey", "orange"]
-    fig, ax = plt.subplots(figsize=(10, 5))
-    sns.barplot(
-        y="aqi_by_pm10_count",
-        x="AQIBYPM10",
-        data=create_aqi_by_pm10_df(main_df),
-        palette=set_custom_palette(create_aqi_by_pm10_df(main_df).sort_values(by="AQIBYPM10")[
-                                   "aqi_by_pm10_count"], color_list)
-    )
-    plt.title("Number of AQI Categories by PM10", fontsize=20)
-    plt.xlabel("Categories", fontsize=14)
-    plt.ylabel(None)  # type: ignore
-    st.pyplot(fig)
+    aqi_by_pm10_df = memo(create_aqi_by_pm10_df, category_source)
+    show_chart(render_aqi_by_pm10, aqi_by_pm10_df, color_list)
 
 st.subheader("Comparing PM2.5, PM10, SO₂, NO₂, and CO Correlation")
 
 avg_so2_col, avg_no2_col, avg_co_col = st.columns(3)
+agg_stats_df = memo(create_agg_stats_df, main_df)
 with avg_so2_col:
-    avg_so2 = create_agg_stats_df(main_df).so2_stats.mean()
+    avg_so2 = agg_stats_df.so2_stats.mean()
     st.metric("Average SO₂ (μg/m³)", value=round(avg_so2, 2))
 with avg_no2_col:
-    avg_no2 = create_agg_stats_df(main_df).no2_stats.mean()
+    avg_no2 = agg_stats_df.no2_stats.mean()
     st.metric("Average NO₂ (μg/m³)", value=round(avg_no2, 2))
 with avg_co_col:
-    avg_co = create_agg_stats_df(main_df).co_stats.mean()
+    avg_co = agg_stats_df.co_stats.mean()
     st.metric("Average CO (μg/m³)", value=round(avg_co, 2))
 
-weekly_tab, monthly_tab, quarterly_tab, semester_tab = st.tabs(
-    ["Weekly", "Monthly", "Quarterly", "Semester"],
-)
-period_plt_title = "per-Week"
-
-def plot_agg(period):
+def plot_agg(period, period_plt_title):
     if main_df.empty:
         st.warning("Tidak ada data untuk ditampilkan.")
         return
-    fig, ax0 = plt.subplots(figsize=(15, 10))
-    plt.grid(zorder=0)
-    plt.plot(
-        create_agg_df(main_df, period).date_time,
-        create_agg_df(main_df, period).avg_pm2_5,
-        label='PM2.5',
-        color='blue',
-        linewidth=3,
-        marker='o'
-    )
-    plt.plot(
-        create_agg_df(main_df, period).date_time,
-        create_agg_df(main_df, period).avg_pm10,
-        label='PM10',
-        color='orange',
-        linewidth=3,
-        marker='o'
+    agg_df = memo(create_agg_df, daily_rollup, selection, period, annual_periods,
+                  params=(period,))
+    rows = downsample_rows(agg_df, ["avg_pm2_5", "avg_pm10", "avg_so2", "avg_no2", "avg_co"],
+                           method=chart_downsampling["agg"])
+    agg_df = agg_df.iloc[rows]
+    show_chart(render_agg, agg_df, period_plt_title)
+
+@st.fragment
+def agg_section():
+    weekly_tab, monthly_tab, quarterly_tab, semester_tab = st.tabs(
+        ["Weekly", "Monthly", "Quarterly", "Semester"],
+        key="agg_tabs",
+        on_change="rerun"
     )
-    plt.plot(
-        create_agg_df(main_df, period).date_time,
-        create_agg_df(main_df, period).avg_so2,
-        label='SO₂',
-        color='green',
-        linestyle=':',
-        linewidth=2,
-        marker='o'
-    )
-    plt.plot(
-        create_agg_df(main_df, period).date_time,
-        create_agg_df(main_df, period).avg_no2,
-        label='NO₂',
-        color='red',
-        linestyle='--',
-        linewidth=2,
-        marker='o'
-    )
-    plt.ylabel("Concentration PM2.5, PM10, SO₂, NO₂ (μg/m³)", fontsize=12)
-    plt.xticks(rotation=45)
-    ax1 = ax0.twinx()
-    ax1.plot(
-        create_agg_df(main_df, period).date_time,
-        create_agg_df(main_df, period).avg_co,
-        label='CO',
-        color='purple',
-        linestyle='-.',
-        marker='o'
-    )
-    ax1.yaxis.tick_right()
-    ax1.set_ylabel("Concentration CO (μg/m³)",
-                   size=12, rotation=270, labelpad=20)
-    ax1.set_xlabel(None)
-    lines1, labels1 = ax0.get_legend_handles_labels()
-    lines2, labels2 = ax1.get_legend_handles_labels()
-    lines = lines1 + lines2
-    labels = labels1 + labels2
-    plt.legend(lines, labels)
-    plt.title(
-        f'Correlation Belong PM2.5, PM10, SO₂, NO₂, and CO {period_plt_title}', fontsize=18)
-    st.pyplot(fig)
-
-with weekly_tab:
-    daily_date_periods = pd.period_range(
-        str(start_date), str(end_date), freq="M")
-    if len(daily_date_periods) > 0:
-        st.subheader("Weekly")
-        period_plt_title = "per-Week"
-        plot_agg("W")
-    else:
-        st.warning("Silakan pilih rentang waktu minimal satu bulan.")
-with monthly_tab:
-    monthly_date_periods = pd.period_range(
-        str(start_date), str(end_date), freq="M")
-    if len(monthly_date_periods) > 3:
-        st.subheader("Monthly")
-        period_plt_title = "per-Month"
-        plot_agg("M")
-    else:
-        st.warning("Silakan pilih rentang waktu minimal satu caturwulan.")
-with quarterly_tab:
-    quarterly_date_periods = pd.period_range(
-        str(start_date), str(end_date), freq="Q")
-    if len(quarterly_date_periods) > 3:
-        st.subheader("Quarterly")
-        period_plt_title = "per-Quartal"
-        plot_agg("Q")
-    else:
-        st.warning("Silakan pilih rentang waktu minimal satu tahun.")
-with semester_tab:
-    if pd.to_datetime(end_date) - pd.to_datetime(start_date) >= max_date - min_date - timedelta(days=1):
-        st.subheader("Semester")
-        period_plt_title = "per-Semester"
-        plot_agg("6M")
-    else:
-        st.warning("Silakan pilih rentang waktu pada semua periode.")
+    with weekly_tab:
+        if weekly_tab.open:
+            daily_date_periods = pd.period_range(
+                str(start_date), str(end_date), freq="M")
+            if len(daily_date_periods) > 0:
+                st.subheader("Weekly")
+                period_plt_title = "per-Week"
+                plot_agg("W", period_plt_title)
+            else:
+                st.warning("Silakan pilih rentang waktu minimal satu bulan.")
+    with monthly_tab:
+        if monthly_tab.open:
+            monthly_date_periods = pd.period_range(
+                str(start_date), str(end_date), freq="M")
+            if len(monthly_date_periods) > 3:
+                st.subheader("Monthly")
+                period_plt_title = "per-Month"
+                plot_agg("M", period_plt_title)
+            else:
+                st.warning("Silakan pilih rentang waktu minimal satu caturwulan.")
+    with quarterly_tab:
+        if quarterly_tab.open:
+            quarterly_date_periods = pd.period_range(
+                str(start_date), str(end_date), freq="Q")
+            if len(quarterly_date_periods) > 3:
+                st.subheader("Quarterly")
+                period_plt_title = "per-Quartal"
+                plot_agg("Q", period_plt_title)
+            else:
+                st.warning("Silakan pilih rentang waktu minimal satu tahun.")
+    with semester_tab:
+        if semester_tab.open:
+            if pd.to_datetime(end_date) - pd.to_datetime(start_date) >= max_date - min_date - timedelta(days=1):
+                st.subheader("Semester")
+                period_plt_title = "per-Semester"
+                plot_agg("6M", period_plt_title)
+            else:
+                st.warning("Silakan pilih rentang waktu pada semua periode.")
+    emit_fragment_charts()
+
+agg_section()
+
+st.markdown("* #### Correlation Matrix of Hourly Readings")
+
+if main_df.empty:
+    st.warning("Tidak ada data untuk ditampilkan.")
+else:
+    correlation_df = memo(create_correlation_df, covariance, selection)
+    show_chart(render_correlation, correlation_df)
+
+emit_charts()
+page_running = False
+
+if profiler.enabled:
+    with st.expander(f"Rerun profile ({profiler.total_ms():.0f} ms)"):
+        st.dataframe(pd.DataFrame(profiler.records), width="stretch")
+        st.caption(f"Run {profiler.run_id}, logged to {profiler.log_path}")
+        st.caption("Memory columns are traced for the whole server process; "
+                   "rows with mem_overlap ran alongside other profiled sections "
+                   "and include their allocations.")
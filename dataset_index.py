@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+
+class DatasetIndex:
+    """Row offsets for a frame sorted by (station, date_time).
+
+    Each station owns one contiguous block of rows, and within a block the
+    timestamps are sorted, so station and date filters become binary
+    searches and slices instead of boolean masks over every row. Annual
+    periods are looked up by their categorical code in a table of row runs
+    sharing one station and one period.
+    """
+
+    def __init__(self, df):
+        self.frame = df
+        stations = df["station"].to_numpy()
+        starts = np.flatnonzero(np.r_[True, stations[1:] != stations[:-1]])
+        self.stations = stations[starts]
+        self.offsets = np.append(starts, len(df))
+        self.station_index = {station: i for i, station in enumerate(self.stations)}
+        self.times = df["date_time"].to_numpy()
+
+        periods = df["annually_period"].astype("category").cat
+        self.period_labels = np.asarray(periods.categories, dtype=object)
+        codes = periods.codes.to_numpy()
+        run_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        run_starts = np.union1d(run_starts, starts)
+        self.period_runs = np.column_stack(
+            [run_starts, np.append(run_starts[1:], len(df))])
+        self.period_run_codes = codes[run_starts]
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df)
+
+    def station_bounds(self, station):
+        i = self.station_index.get(station)
+        if i is None:
+            return 0, 0
+        return self.offsets[i], self.offsets[i + 1]
+
+    def time_bounds(self, lo, hi, start=None, end=None):
+        """Narrow rows ``lo:hi`` of one station to ``start <= date_time < end``."""
+        times = self.times[lo:hi]
+        first, last = 0, len(times)
+        if start is not None:
+            first = np.searchsorted(times, np.datetime64(pd.Timestamp(start)))
+        if end is not None:
+            last = np.searchsorted(times, np.datetime64(pd.Timestamp(end)))
+        return lo + first, lo + max(first, last)
+
+    def period_bounds(self, annual_periods, station=None):
+        codes = np.flatnonzero(np.isin(self.period_labels, annual_periods))
+        runs = self.period_runs[np.isin(self.period_run_codes, codes)]
+        if station is not None:
+            lo, hi = self.station_bounds(station)
+            runs = runs[(runs[:, 0] >= lo) & (runs[:, 1] <= hi)]
+        return [tuple(run) for run in runs]
+
+    def bounds(self, station=None, start=None, end=None, annual_periods=None):
+        if annual_periods is not None:
+            return [
+                self.time_bounds(lo, hi, start, end)
+                for lo, hi in self.period_bounds(annual_periods, station)
+            ]
+        if station is not None:
+            return [self.time_bounds(*self.station_bounds(station), start, end)]
+        return [
+            self.time_bounds(self.offsets[i], self.offsets[i + 1], start, end)
+            for i in range(len(self.stations))
+        ]
+
+    def select(self, station=None, start=None, end=None, annual_periods=None):
+        """Rows of ``station`` (all stations if None) with
+        ``start <= date_time < end``, optionally limited to the given
+        ``annually_period`` labels.
+
+        A single station, or all stations over the full time span, is a
+        zero-copy slice; a date range over all stations gathers one slice
+        per station.
+        """
+        if station is None and start is None and end is None and annual_periods is None:
+            return self.frame
+        return self.take(self.bounds(station, start, end, annual_periods))
+
+    def view(self, station=None, start=None, end=None, annual_periods=None):
+        return RowView(self, station=station, start=start, end=end,
+                       annual_periods=annual_periods)
+
+    def take(self, bounds):
+        bounds = [(lo, hi) for lo, hi in bounds if hi > lo]
+        if len(bounds) == 0:
+            return self.frame.iloc[0:0]
+        if len(bounds) == 1:
+            return self.frame.iloc[bounds[0][0]:bounds[0][1]]
+        positions = np.concatenate([np.arange(lo, hi) for lo, hi in bounds])
+        return self.frame.take(positions)
+
+
+class RowView:
+    """A filter over a shared DatasetIndex whose rows are gathered on demand.
+
+    Sessions hold only this and the filter parameters. ``rows()`` builds the
+    selection (a zero-copy slice where possible) for one computation and the
+    view does not keep it, so concurrent sessions share the base frame
+    instead of each holding a filtered copy.
+    """
+
+    def __init__(self, index, **filters):
+        self.index = index
+        self.filters = filters
+        if all(value is None for value in filters.values()):
+            self.length = len(index.frame)
+        else:
+            self.length = sum(hi - lo for lo, hi in index.bounds(**filters) if hi > lo)
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def empty(self):
+        return self.length == 0
+
+    def rows(self):
+        return self.index.select(**self.filters)
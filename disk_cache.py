@@ -0,0 +1,171 @@
+"""Persistent on-disk cache shared by the server processes of one host.
+
+Every entry is one file named by a hash of its namespace and key, holding
+the key and the value pickled and zlib-compressed. The namespace includes a
+hash of this package's source, so a deploy that changes the code starts a
+fresh cache, and callers add the fingerprint of the data the values were
+computed from. Entries are written to a temporary file and renamed into
+place, so concurrent readers see a whole entry or none. A read refreshes
+the entry's mtime; once the directory outgrows its byte budget, the least
+recently used entries are deleted. Unreadable entries count as misses.
+
+Entries are pickles: keep the directory private to the server's user.
+"""
+import glob
+import hashlib
+import os
+import pickle
+import threading
+import time
+import zlib
+from functools import lru_cache
+
+ENTRY_SUFFIX = ".entry"
+# Leftover temporary files of crashed writers are removed after this long.
+STALE_TMP_SECONDS = 3600
+MISSING = object()
+
+
+def cache_dir(path):
+    return os.path.splitext(path)[0] + ".cache"
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """Hash of the package's Python sources."""
+    digest = hashlib.sha1()
+    for source in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+        with open(source, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """Key-value files in ``directory``, evicted least recently used first
+    once they take more than ``max_bytes``.
+
+    Several instances, in one process or many, can share a directory; each
+    only sees the entries of its own ``namespace``, and all of them count
+    against the same budget.
+    """
+
+    def __init__(self, directory, namespace="", max_bytes=256 * 2**20):
+        self.directory = directory
+        self.namespace = repr((code_version(), namespace))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._written = 0
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        except OSError:
+            # A read-only data directory only costs us the warm restart.
+            self.errors += 1
+
+    def _path(self, key):
+        digest = hashlib.sha1(f"{self.namespace}\0{key!r}".encode()).hexdigest()
+        return os.path.join(self.directory, digest + ENTRY_SUFFIX)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key, default=MISSING):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                stored_key, value = pickle.loads(zlib.decompress(file.read()))
+        except FileNotFoundError:
+            stored_key, value = None, default
+        except Exception:
+            # Truncated or foreign file: drop it and recompute.
+            self._remove(path)
+            stored_key, value = None, default
+        with self._lock:
+            if stored_key != repr(key):
+                self.misses += 1
+                return default
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        data = zlib.compress(pickle.dumps((repr(key), value), pickle.HIGHEST_PROTOCOL), 1)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            self._remove(tmp_path)
+            with self._lock:
+                self.errors += 1
+            return
+        with self._lock:
+            self._written += len(data)
+            # Scan the directory only after writing a slice of the budget.
+            scan = self._written > self.max_bytes // 8
+            if scan:
+                self._written = 0
+        if scan:
+            self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries of every namespace until
+        the directory fits in ``max_bytes``."""
+        entries = []
+        now = time.time()
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if entry.name.endswith(ENTRY_SUFFIX):
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    elif entry.name.endswith(".tmp") and now - stat.st_mtime > STALE_TMP_SECONDS:
+                        self._remove(entry.path)
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Another process may have evicted it already.
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        sizes = []
+        try:
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if entry.name.endswith(ENTRY_SUFFIX):
+                        try:
+                            sizes.append(entry.stat().st_size)
+                        except OSError:
+                            pass
+        except OSError:
+            pass
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "size": len(sizes),
+                "bytes": sum(sizes),
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,122 @@
+import numpy as np
+
+# Charts are shown at the width of Streamlit's main column, about this many
+# pixels; more points per series than that cannot be told apart.
+DEFAULT_MAX_POINTS = 700
+
+
+def finite_runs(values):
+    """``(starts, stops)`` of every run of consecutive finite values."""
+    finite = np.concatenate([[False], np.isfinite(values), [False]])
+    edges = np.flatnonzero(finite[1:] != finite[:-1])
+    return edges[::2], edges[1::2]
+
+
+def split_budget(lengths, max_points):
+    """Points for each run, at most its length and ``max_points`` in total:
+    shares proportional to run length, rounded down, with the remainder
+    going first to runs left without a point, then to the largest
+    fractions."""
+    total = lengths.sum()
+    if total <= max_points:
+        return lengths
+    shares = max_points * lengths / total
+    budgets = np.floor(shares).astype(int)
+    order = np.lexsort((budgets - shares, budgets > 0))
+    budgets[order[:max_points - budgets.sum()]] += 1
+    return budgets
+
+
+def per_run(select, values, max_points):
+    """Positions ``select`` keeps in each finite run, within ``max_points``
+    over all runs, plus the NaN row after every run but the last, so the
+    line still breaks at each gap."""
+    starts, stops = finite_runs(values)
+    kept = [stops[:-1]]
+    for start, stop, budget in zip(starts, stops, split_budget(stops - starts, max_points)):
+        kept.append(start + select(values[start:stop], budget))
+    return np.sort(np.concatenate(kept)).astype(int)
+
+
+def _lttb(values, max_points):
+    n = len(values)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 3:
+        return np.linspace(0, n - 1, max_points).astype(int)
+    x = np.arange(n, dtype=float)
+    y = values
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    edges = np.append(edges, n)
+    kept = [0]
+    anchor = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = edges[i + 1], edges[i + 2]
+        mean_x = x[next_lo:next_hi].mean()
+        mean_y = y[next_lo:next_hi].mean()
+        area = np.abs(
+            (x[anchor] - mean_x) * (y[lo:hi] - y[anchor])
+            - (x[anchor] - x[lo:hi]) * (mean_y - y[anchor]))
+        anchor = lo + np.argmax(area)
+        kept.append(anchor)
+    kept.append(n - 1)
+    return np.asarray(kept)
+
+
+def _minmax(values, max_points):
+    n = len(values)
+    buckets = max_points // 2
+    if max_points >= n:
+        return np.arange(n)
+    if buckets < 1:
+        return np.array([np.argmax(values)])[:max_points]
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    bucket_ids = np.repeat(np.arange(buckets), np.diff(edges))
+    order = np.lexsort((values, bucket_ids))
+    lowest = order[edges[:-1]]
+    highest = order[edges[1:] - 1]
+    return np.union1d(lowest, highest)
+
+
+def lttb_indices(values, max_points):
+    """Largest-Triangle-Three-Buckets over evenly spaced points, run by run
+    between NaN gaps.
+
+    Returns the positions of the kept points: finite points, and one NaN
+    point closing each gap between runs.
+    """
+    return per_run(_lttb, values, max_points)
+
+
+def minmax_indices(values, max_points):
+    """Min/max envelope: the lowest and highest point of each bucket, run by
+    run between NaN gaps as in ``lttb_indices``."""
+    return per_run(_minmax, values, max_points)
+
+
+METHODS = {
+    "lttb": lttb_indices,
+    "minmax": minmax_indices,
+}
+
+
+def downsample_rows(df, columns, max_points=DEFAULT_MAX_POINTS, method="lttb"):
+    """Row positions to keep so that plotting ``columns`` uses at most
+    ``max_points`` points in total.
+
+    All series of a chart share the returned rows, which keeps string x-axes
+    in order. The global minimum and maximum of every series are always kept,
+    and so is a NaN row in every gap, so lines are not drawn across missing
+    data. ``method=None`` keeps every row.
+    """
+    if method is None or len(df) <= max_points:
+        return np.arange(len(df))
+    budget = max(max_points // len(columns) - 2, 3)
+    rows = []
+    for column in columns:
+        values = df[column].to_numpy(dtype=float)
+        rows.append(METHODS[method](values, budget))
+        if np.isfinite(values).any():
+            rows.append([np.nanargmin(values), np.nanargmax(values)])
+    return np.unique(np.concatenate(rows)).astype(int)
@@ -0,0 +1,90 @@
+"""Station x time axes shared by the per-station tables.
+
+``DailyRollup``, ``CovarianceRollup`` and ``QuantileSketches`` keep
+``(station, day)`` tables and ``RollingAqi`` a ``(station, hour)`` grid.
+``StationGrid`` holds what they share: the sorted stations, every day (or
+hour) from the first reading to the last, and the annual period of each
+step. It maps rows to cells, places the cells of one grid in a grid that
+covers it, and masks the steps a sidebar selection keeps.
+"""
+import numpy as np
+import pandas as pd
+
+STEPS = {"D": pd.Timedelta(days=1), "h": pd.Timedelta(hours=1)}
+
+
+class StationGrid:
+
+    def __init__(self, times, stations, periods, period_labels, freq="D"):
+        self.times = times
+        self.stations = stations
+        self.station_index = {station: i for i, station in enumerate(stations)}
+        # Code in period_labels of every step, -1 where it has no reading.
+        self.periods = periods
+        self.period_labels = period_labels
+        self.freq = freq
+
+    @property
+    def shape(self):
+        return len(self.stations), len(self.times)
+
+    @classmethod
+    def from_frame(cls, df, freq="D"):
+        """Grid spanning the rows of ``df``, with the station and time codes
+        of every row."""
+        time = df["date_time"].dt.floor(freq)
+        times = pd.date_range(time.min(), time.max(), freq=freq, name="date_time")
+        stations = np.sort(df["station"].unique())
+        station_codes = np.searchsorted(stations, df["station"].to_numpy())
+        time_codes = ((time - times[0]) // STEPS[freq]).to_numpy()
+        period_codes, period_labels = pd.factorize(df["annually_period"], sort=True)
+        periods = np.full(len(times), -1)
+        periods[time_codes] = period_codes
+        grid = cls(times, stations, periods, np.asarray(period_labels, dtype=object), freq)
+        return grid, station_codes, time_codes
+
+    @classmethod
+    def from_catalog(cls, catalog, freq="D"):
+        """Grid over every station and step of the catalog's span, so tables
+        built from chunks are allocated once; ``include`` fills in periods."""
+        times = pd.date_range(catalog.min_date.floor(freq), catalog.max_date.floor(freq),
+                              freq=freq, name="date_time")
+        return cls(times, np.asarray(catalog.stations, dtype=object),
+                   np.full(len(times), -1), np.asarray(catalog.annual_periods, dtype=object),
+                   freq)
+
+    def union(self, other):
+        """Grid over the stations and span of both; ``include`` each of them
+        to fill in periods."""
+        times = pd.date_range(min(self.times[0], other.times[0]),
+                              max(self.times[-1], other.times[-1]),
+                              freq=self.freq, name="date_time")
+        return StationGrid(times, np.union1d(self.stations, other.stations),
+                           np.full(len(times), -1),
+                           np.union1d(self.period_labels, other.period_labels), self.freq)
+
+    def include(self, part):
+        """Record the periods of grid ``part``, which this grid covers, and
+        return ``(rows, columns)`` indexing its cells here, broadcasting to
+        ``part.shape``."""
+        rows = np.searchsorted(self.stations, part.stations)[:, None]
+        first = (part.times[0] - self.times[0]) // STEPS[self.freq]
+        columns = np.arange(first, first + len(part.times))[None, :]
+        known = part.periods >= 0
+        codes = np.searchsorted(self.period_labels, part.period_labels)
+        self.periods[columns[0][known]] = codes[part.periods[known]]
+        return rows, columns
+
+    def mask(self, start=None, end=None, annual_periods=None):
+        """Steps on the days from ``start`` to ``end``, both inclusive, that
+        fall in one of ``annual_periods``."""
+        mask = np.ones(len(self.times), dtype=bool)
+        days = self.times if self.freq == "D" else self.times.floor("D")
+        if start is not None:
+            mask &= days >= pd.Timestamp(start).floor("D")
+        if end is not None:
+            mask &= days <= pd.Timestamp(end).floor("D")
+        if annual_periods is not None:
+            codes = np.flatnonzero(np.isin(self.period_labels, annual_periods))
+            mask &= np.isin(self.periods, codes)
+        return mask
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+LEADERBOARD_SIZE = 5
+RANKING_QUANTILE = 0.95
+# Ranking name -> (score, pollutant).
+RANKINGS = {
+    "PM2.5 average": ("mean", "PM2.5"),
+    "PM10 average": ("mean", "PM10"),
+    "PM2.5 P95": ("quantile", "PM2.5"),
+    "PM10 P95": ("quantile", "PM10"),
+    "PM2.5 hours above AQI 100": ("exceedance", "PM2.5"),
+    "PM10 hours above AQI 100": ("exceedance", "PM10"),
+}
+SCORE_LABELS = {
+    "mean": "Concentration (μg/m³)",
+    "quantile": "Concentration (μg/m³)",
+    "exceedance": "Hours",
+}
+
+
+def top_n(scores, n, largest=True):
+    """The ``n`` largest (or smallest) scores in order. Only those ``n`` are
+    sorted, after an ``argpartition`` pass over all of them."""
+    values = scores.to_numpy(dtype=float)
+    n = max(min(n, len(values)), 0)
+    keys = -values if largest else values
+    if n < len(values):
+        candidates = np.argpartition(keys, n)[:n]
+    else:
+        candidates = np.arange(len(values))
+    return scores.iloc[candidates[np.argsort(keys[candidates], kind="stable")]]
+
+
+def station_rank(scores, station):
+    """Rank of ``station`` among all scored stations, 1 for the highest
+    score; ties share a rank. None if the station has no score."""
+    if station not in scores.index:
+        return None
+    return int((scores > scores[station]).sum()) + 1
+
+
+def leaders(scores, n=LEADERBOARD_SIZE):
+    """The ``n`` worst (highest) and ``n`` best stations with their ranks
+    among all stations."""
+    frames = []
+    for side, largest in [("worst", True), ("best", False)]:
+        ranked = top_n(scores, n, largest)
+        frames.append(pd.DataFrame({
+            "station": ranked.index,
+            "score": ranked.to_numpy(),
+            "rank": [station_rank(scores, station) for station in ranked.index],
+            "side": side,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+class StationLeaderboard:
+    """Scores every station for a ranking from the per-station running
+    aggregates: day sums and counts of the daily rollup, the quantile
+    sketches and the 24-hour means. A score costs one pass over the
+    station x day (or hour) tables, never over the rows.
+    """
+
+    def __init__(self, rollup, sketches, rolling):
+        self.rollup = rollup
+        self.sketches = sketches
+        self.rolling = rolling
+
+    def scores(self, ranking, start=None, end=None, annual_periods=None):
+        """Score per station on the selected days, for stations with one."""
+        score, pollutant = RANKINGS[ranking]
+        if score == "mean":
+            scores = self.rollup.station_means([pollutant], start, end, annual_periods)[pollutant]
+        elif score == "quantile":
+            scores = self.sketches.station_quantiles(
+                pollutant, RANKING_QUANTILE, start, end, annual_periods)
+        else:
+            scores = self.rolling.station_exceedance_hours(pollutant, start, end, annual_periods)
+        return scores.dropna().rename("score")
@@ -0,0 +1,267 @@
+import glob
+import os
+import threading
+import pandas as pd
+from pandas.api.types import union_categoricals
+from aqi import CATEGORY_COLUMNS, SCALES
+from column_store import read_store, write_store
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FINGERPRINT_KEY = b"source_fingerprint"
+LAYOUT_KEY = b"layout"
+# Rows are kept sorted by station, then time, so dataset_index can slice
+# stations and date ranges without scanning.
+SORT_KEYS = ["station", "date_time"]
+CATEGORICAL_COLUMNS = ["annually_period", *CATEGORY_COLUMNS]
+LAYOUT = f"sorted:{','.join(SORT_KEYS)};categorical:{','.join(CATEGORICAL_COLUMNS)}"
+
+# Process-wide cache, survives Streamlit reruns because imported modules are
+# not re-executed. Maps the absolute source path to (fingerprint, dataframe,
+# derived structures built from that dataframe, delta ingestion state).
+_loaded = {}
+_ingest_lock = threading.Lock()
+
+
+def source_fingerprint(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def columnar_path(path):
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def store_path(path):
+    return os.path.splitext(path)[0] + ".columns"
+
+
+def check_category_columns(df, path):
+    """Raise ``ValueError`` if a precomputed category column of the source
+    disagrees with the category of its concentration. The charts count
+    categories from the concentrations, so the labels the source ships must
+    be the same ones."""
+    for column, pollutant in CATEGORY_COLUMNS.items():
+        if column not in df:
+            continue
+        scale = SCALES[pollutant]
+        derived = scale.codes(df[pollutant])
+        # Labels outside the scale get code -1 and count as mismatches.
+        labels = pd.Categorical(df[column], categories=scale.categories).codes
+        mismatch = derived != labels
+        if mismatch.any():
+            row = int(mismatch.argmax())
+            raise ValueError(
+                f"{path}: {int(mismatch.sum())} rows of {column} disagree with the AQI "
+                f"category of {pollutant}, e.g. {df[pollutant].iloc[row]} labelled "
+                f"{df[column].iloc[row]!r} instead of {scale.labels(derived[row:row + 1])[0]!r}")
+
+
+def read_source_csv(path):
+    df = pd.read_csv(path)
+    df["date_time"] = pd.to_datetime(df["date_time"])
+    check_category_columns(df, path)
+    for column, pollutant in CATEGORY_COLUMNS.items():
+        if column not in df:
+            scale = SCALES[pollutant]
+            df[column] = pd.Categorical.from_codes(
+                scale.codes(df[pollutant]), scale.categories)
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype("category")
+    return df.sort_values(SORT_KEYS, kind="stable", ignore_index=True)
+
+
+def columnar_is_current(path, fingerprint):
+    if pq is None or not os.path.exists(path):
+        return False
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+    except (OSError, pa.ArrowException):
+        return False
+    return (metadata.get(FINGERPRINT_KEY) == fingerprint.encode()
+            and metadata.get(LAYOUT_KEY) == LAYOUT.encode())
+
+
+def read_columnar(path, fingerprint):
+    if not columnar_is_current(path, fingerprint):
+        return None
+    try:
+        return pq.read_table(path).to_pandas()
+    except (OSError, pa.ArrowException):
+        return None
+
+
+def write_columnar(df, path, fingerprint):
+    if pq is None:
+        return
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[FINGERPRINT_KEY] = fingerprint.encode()
+    metadata[LAYOUT_KEY] = LAYOUT.encode()
+    table = table.replace_schema_metadata(metadata)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        # A read-only data directory only costs us the fast cold start.
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_main_data(path, fingerprint):
+    """Source rows from the memory-mapped column store when it is current,
+    else from the Parquet copy, else from the CSV (refreshing the Parquet
+    copy)."""
+    df = read_store(store_path(path), fingerprint, LAYOUT)
+    if df is not None:
+        return df
+    parquet_path = columnar_path(path)
+    df = read_columnar(parquet_path, fingerprint)
+    if df is None:
+        df = read_source_csv(path)
+        write_columnar(df, parquet_path, fingerprint)
+    return df
+
+
+def write_column_store(path="main_data.csv"):
+    """Convert the source into the column store ``load_main_data`` prefers."""
+    path = os.path.abspath(path)
+    fingerprint = source_fingerprint(path)
+    df = read_main_data(path, fingerprint)
+    write_store(df, store_path(path), fingerprint, LAYOUT)
+    return store_path(path)
+
+
+def load_main_data(path="main_data.csv"):
+    path = os.path.abspath(path)
+    fingerprint = source_fingerprint(path)
+    with _ingest_lock:
+        cached = _loaded.get(path)
+        if cached is None or cached[0] != fingerprint:
+            df = read_main_data(path, fingerprint)
+            _loaded[path] = (fingerprint, df, {}, DeltaState(station_watermarks(df)))
+        return ingest_deltas(path)
+
+
+def data_fingerprint(path="main_data.csv"):
+    """Fingerprint of the source and of the delta files ingested into the
+    loaded frame."""
+    path = os.path.abspath(path)
+    cached = _loaded.get(path)
+    files = sorted(cached[3].files.items()) if cached is not None else []
+    return ";".join([source_fingerprint(path)] + [
+        f"{os.path.basename(delta_path)}:{fingerprint}" for delta_path, fingerprint in files])
+
+
+def cached_derived(loaded, load, name, build, path):
+    """``build(load(path))``, kept under ``name`` with the structures derived
+    from the loaded source, the third item of ``loaded[path]``, until
+    ``load`` reloads it.
+
+    A reload or delta ingestion may replace the source while it is built;
+    that structure describes the old rows, so it is dropped and built again
+    from the new source instead of being stored with it.
+    """
+    path = os.path.abspath(path)
+    while True:
+        source = load(path)
+        with _ingest_lock:
+            current, derived = loaded[path][1:3]
+        if current is not source:
+            continue
+        if name in derived:
+            return derived[name]
+        value = build(source)
+        with _ingest_lock:
+            current, derived = loaded[path][1:3]
+            if current is source:
+                return derived.setdefault(name, value)
+
+
+def load_derived(name, build, path="main_data.csv"):
+    return cached_derived(_loaded, load_main_data, name, build, path)
+
+
+class DeltaState:
+    """Which delta files were read, and the newest reading per station."""
+
+    def __init__(self, watermarks):
+        self.watermarks = watermarks
+        self.files = {}
+
+
+def delta_paths(path):
+    """New readings for ``main_data.csv`` go in ``main_data_delta.csv`` or
+    in any ``*.csv`` under ``main_data_delta/``, in the source's columns."""
+    base = os.path.splitext(path)[0] + "_delta"
+    paths = sorted(glob.glob(os.path.join(base, "*.csv")))
+    if os.path.isfile(base + ".csv"):
+        paths.append(base + ".csv")
+    return paths
+
+
+def station_watermarks(df):
+    return df.groupby("station", observed=True)["date_time"].max().to_dict()
+
+
+def read_new_rows(paths, watermarks):
+    """Rows of the delta files newer than their station's watermark."""
+    frames = [read_source_csv(path) for path in paths]
+    delta = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    watermark = delta["station"].map(watermarks)
+    delta = delta[watermark.isna() | (delta["date_time"] > watermark)]
+    delta = delta.drop_duplicates(["station", "date_time"], keep="last")
+    return align_categories(delta.sort_values(SORT_KEYS, kind="stable", ignore_index=True))
+
+
+def align_categories(*frames):
+    for column in CATEGORICAL_COLUMNS:
+        categories = union_categoricals(
+            [frame[column].astype("category") for frame in frames],
+            sort_categories=True).categories
+        for frame in frames:
+            frame[column] = pd.Categorical(frame[column], categories=categories)
+    return frames[0] if len(frames) == 1 else frames
+
+
+def merge_rows(df, delta):
+    df, delta = align_categories(df.copy(deep=False), delta)
+    merged = pd.concat([df, delta], ignore_index=True)
+    return merged.sort_values(SORT_KEYS, kind="stable", ignore_index=True)
+
+
+def ingest_deltas(path):
+    """Merge delta rows newer than the per-station watermarks into the loaded
+    frame. Only delta files whose fingerprint changed are read.
+
+    Derived structures with an ``append(delta, df)`` method are updated from
+    the new rows alone; any other derived structure is dropped and rebuilt by
+    ``load_derived`` on first use.
+    """
+    fingerprint, df, derived, state = _loaded[path]
+    changed = {}
+    for delta_path in delta_paths(path):
+        delta_fingerprint = source_fingerprint(delta_path)
+        if state.files.get(delta_path) != delta_fingerprint:
+            changed[delta_path] = delta_fingerprint
+    if not changed:
+        return df
+
+    delta = read_new_rows(list(changed), state.watermarks)
+    state.files.update(changed)
+    if len(delta) == 0:
+        return df
+    df = merge_rows(df, delta)
+    derived = {
+        name: value.append(delta, df)
+        for name, value in derived.items() if hasattr(value, "append")
+    }
+    state.watermarks.update(station_watermarks(delta))
+    _loaded[path] = (fingerprint, df, derived, state)
+    return df
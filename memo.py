@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+from disk_cache import MISSING, DiskCache
+
+
+class AggregateCache:
+    """Bounded LRU cache for aggregate frames, shared across reruns.
+
+    Keys are built by the caller from the aggregation kind, its parameters
+    and the sidebar filter state. Cached frames are shared, so callers must
+    not modify them in place. With a ``DiskCache`` as ``store``, every
+    stored aggregate is also written there, and memory misses are looked
+    up there before computing.
+    """
+
+    def __init__(self, maxsize=256, store=None):
+        self.maxsize = maxsize
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, *args):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        if self.store is not None:
+            value = self.store.get(key)
+            if value is not MISSING:
+                self._remember(key, value)
+                return value
+        # Compute outside the lock so one slow aggregate does not block
+        # sessions that only need cached ones.
+        value = compute(*args)
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.store is not None:
+            self.store.put(key, value)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def disk_store(directory, fingerprint, backend, max_bytes):
+    """``DiskCache`` for the aggregates ``backend`` ("pandas", "streaming"
+    or "sql") computes from the data with ``fingerprint``."""
+    return DiskCache(directory, ("aggregates", backend, fingerprint), max_bytes)
+
+
+def selection_key(selection):
+    """Hashable form of the sidebar selection, the scope of cached aggregates."""
+    return tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in selection.items()))
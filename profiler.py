@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from contextlib import contextmanager
+
+DEFAULT_LOG_PATH = "profile_log.jsonl"
+
+_log_lock = threading.Lock()
+
+# tracemalloc is process-wide: it is started by the first live profiler and
+# stopped when the last one is collected, with the session that ran it.
+# Sections share its peak, which is only reset when no section is open.
+_trace_lock = threading.Lock()
+_tracing_profilers = 0
+_started_tracing = False
+_open_sections = 0
+_section_starts = 0
+
+
+def _acquire_tracing():
+    global _tracing_profilers, _started_tracing
+    with _trace_lock:
+        if _tracing_profilers == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        _tracing_profilers += 1
+
+
+def _release_tracing():
+    global _tracing_profilers, _started_tracing
+    with _trace_lock:
+        _tracing_profilers -= 1
+        if _tracing_profilers == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def _open_section():
+    global _open_sections, _section_starts
+    with _trace_lock:
+        if _open_sections == 0:
+            tracemalloc.reset_peak()
+        _open_sections += 1
+        _section_starts += 1
+        memory_before, _ = tracemalloc.get_traced_memory()
+        return memory_before, _section_starts, _open_sections > 1
+
+
+def _close_section(starts, overlapped):
+    global _open_sections
+    with _trace_lock:
+        _open_sections -= 1
+        memory_after, memory_peak = tracemalloc.get_traced_memory()
+        return memory_after, memory_peak, overlapped or _section_starts != starts
+
+
+class RerunProfiler:
+    """Opt-in per-section timings for one dashboard rerun.
+
+    Every section records wall time, rows in/out and the change and peak of
+    traced Python/NumPy memory. Records are kept for the debug panel and,
+    when ``log_path`` is set, appended to a JSON-lines file as each section
+    finishes, so fragment reruns are logged too.
+
+    Memory is traced for the whole process while any profiler is alive.
+    When sections overlap, in other sessions or threads, their figures
+    include each other's allocations and ``mem_overlap`` is set.
+    """
+
+    def __init__(self, enabled=False, log_path=None, context=None):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.context = context or {}
+        self.run_id = uuid.uuid4().hex[:12]
+        self.records = []
+        if enabled:
+            _acquire_tracing()
+            weakref.finalize(self, _release_tracing)
+
+    @contextmanager
+    def section(self, name, rows_in=None):
+        """Time the body of a ``with`` block.
+
+        Yields a dict the caller can update, typically with ``rows_out``.
+        """
+        record = {"section": name, "rows_in": rows_in, "rows_out": None}
+        if not self.enabled:
+            yield record
+            return
+        memory_before, starts, overlapped = _open_section()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            wall_ms = (time.perf_counter() - start) * 1000
+            memory_after, memory_peak, overlapped = _close_section(starts, overlapped)
+            record.update({
+                "wall_ms": round(wall_ms, 3),
+                "mem_delta_kib": round((memory_after - memory_before) / 1024, 1),
+                "mem_peak_kib": round((memory_peak - memory_before) / 1024, 1),
+                "mem_overlap": overlapped,
+            })
+            self.records.append(record)
+            if self.log_path:
+                self._append_log(record)
+
+    def _append_log(self, record):
+        line = json.dumps({
+            "run_id": self.run_id,
+            "time": time.time(),
+            "pid": os.getpid(),
+            **self.context,
+            **record,
+        }, default=str)
+        with _log_lock, open(self.log_path, "a") as log:
+            log.write(line + "\n")
+
+    def total_ms(self):
+        return sum(record["wall_ms"] for record in self.records)
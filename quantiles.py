@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+
+from grid import StationGrid
+
+SKETCH_POLLUTANTS = ["PM2.5", "PM10"]
+TILE_QUANTILES = [0.5, 0.9, 0.95, 0.99]
+BAND_QUANTILES = [0.1, 0.9]
+# Every quantile between MIN_VALUE and MAX_VALUE is returned within
+# RELATIVE_ACCURACY of the reading at its rank; at or below MIN_VALUE (the
+# readings' resolution) within MIN_VALUE. Readings above MAX_VALUE, the
+# instruments' ceiling, count in the top bucket.
+RELATIVE_ACCURACY = 0.02
+MIN_VALUE = 1.0
+MAX_VALUE = 1000.0
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+
+
+def bucket_index(values):
+    """Log bucket of each reading: bucket ``i > 0`` holds
+    ``(MIN_VALUE * GAMMA**(i - 1), MIN_VALUE * GAMMA**i]``, bucket 0 the
+    readings up to ``MIN_VALUE``."""
+    ratio = np.clip(values, MIN_VALUE, MAX_VALUE) / MIN_VALUE
+    # Ratios within rounding of a bucket bound stay in the lower bucket.
+    return np.ceil(np.round(np.log(ratio) / np.log(GAMMA), 9)).astype(np.int64)
+
+
+def bucket_value(index):
+    """Value whose relative distance to either bound of the bucket is
+    ``RELATIVE_ACCURACY``."""
+    index = np.asarray(index)
+    value = MIN_VALUE * 2 * GAMMA ** index / (GAMMA + 1)
+    return np.where(index > 0, value, MIN_VALUE)
+
+
+BUCKETS = int(bucket_index(MAX_VALUE)) + 1
+
+
+def day_runs(mask):
+    """``(starts, stops)`` of every run of selected days."""
+    padded = np.concatenate([[False], mask, [False]])
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return edges[::2], edges[1::2]
+
+
+class QuantileSketches:
+    """Per-station, per-day quantile sketches of PM2.5 and PM10.
+
+    A sketch is a histogram over ``BUCKETS`` logarithmic buckets, so
+    sketches merge by adding counts and a quantile of any station and day
+    selection is read from the cumulative counts of the merged histogram.
+    Counts are kept cumulated over days in a dense int32
+    ``(station, day + 1, bucket)`` array per pollutant, with the sum over
+    stations alongside, so the histogram of a run of days is the difference
+    of two day rows and a query costs one row per run of selected days.
+    That is 4 bytes per station-day and bucket, about 12 MB per pollutant
+    for the Beijing set (12 stations, 1,461 days, 174 buckets).
+    """
+
+    def __init__(self, grid, cumulative):
+        self.grid = grid
+        self.days = grid.times
+        self.stations = grid.stations
+        self.station_index = grid.station_index
+        # pollutant -> (station, day + 1, bucket) counts cumulated over days.
+        self.cumulative = cumulative
+        self.totals = {pollutant: counts.sum(axis=0, dtype=np.int32)
+                       for pollutant, counts in cumulative.items()}
+
+    @staticmethod
+    def _empty(grid):
+        return np.zeros((grid.shape[0], grid.shape[1] + 1, BUCKETS), dtype=np.int32)
+
+    @staticmethod
+    def _cumulate(counts):
+        """Cumulate per-day counts over days in place, one day at a time so
+        no second array of the same size is needed."""
+        for day in range(1, counts.shape[1]):
+            counts[:, day] += counts[:, day - 1]
+        return counts
+
+    @classmethod
+    def from_frame(cls, df, pollutants=SKETCH_POLLUTANTS):
+        grid, station_codes, day_codes = StationGrid.from_frame(df)
+        cumulative = {}
+        for pollutant in pollutants:
+            counts = cls._empty(grid)
+            values = df[pollutant].to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            # Per-day counts go one day row down, after the zero row.
+            cells = ((station_codes[valid] * counts.shape[1] + day_codes[valid] + 1) * BUCKETS
+                     + bucket_index(values[valid]))
+            np.add.at(counts.reshape(-1), cells, 1)
+            cumulative[pollutant] = cls._cumulate(counts)
+        return cls(grid, cumulative)
+
+    @classmethod
+    def from_parts(cls, grid, parts, pollutants=SKETCH_POLLUTANTS):
+        """Sketches on ``grid`` of the rows of every sketch in ``parts``."""
+        cumulative = {pollutant: cls._empty(grid) for pollutant in pollutants}
+        for part in parts:
+            rows, columns = grid.include(part.grid)
+            for pollutant, counts in cumulative.items():
+                counts[rows, columns + 1] += part.daily_counts(pollutant)
+        return cls(grid, {pollutant: cls._cumulate(counts)
+                          for pollutant, counts in cumulative.items()})
+
+    @classmethod
+    def from_chunks(cls, chunks, catalog, pollutants=SKETCH_POLLUTANTS):
+        """Sketches of chunked rows, without holding the rows: the counts
+        span the catalog's stations and days, are allocated once and every
+        chunk adds its readings."""
+        return cls.from_parts(StationGrid.from_catalog(catalog),
+                              (cls.from_frame(chunk, pollutants) for chunk in chunks if len(chunk)),
+                              pollutants)
+
+    def daily_counts(self, pollutant):
+        """Per-day ``(station, day, bucket)`` counts."""
+        return np.diff(self.cumulative[pollutant], axis=1)
+
+    def merge(self, other):
+        """Sketches of the rows of both, on the union of their days and
+        stations."""
+        return QuantileSketches.from_parts(self.grid.union(other.grid), [self, other],
+                                           list(self.cumulative))
+
+    def append(self, delta, df):
+        return self.merge(QuantileSketches.from_frame(delta, list(self.cumulative)))
+
+    def _cumulative(self, pollutant, station):
+        if station is None:
+            return self.totals[pollutant]
+        return self.cumulative[pollutant][self.station_index[station]]
+
+    @staticmethod
+    def _histograms(cumulative, mask):
+        """Counts over the selected days, one difference of two day rows
+        per run of selected days."""
+        starts, stops = day_runs(mask)
+        runs = (cumulative[..., stops, :].astype(np.int64)
+                - cumulative[..., starts, :])
+        return runs.sum(axis=-2)
+
+    @staticmethod
+    def _read(histograms, quantiles):
+        # Lower quantile: the bucket holding the reading of rank
+        # ceil(q * n), as np.quantile(method="inverted_cdf") picks it.
+        cumulative = np.cumsum(histograms, axis=-1)
+        totals = cumulative[..., -1:]
+        ranks = np.maximum(np.ceil(np.round(np.asarray(quantiles) * totals, 9)), 1)
+        index = (cumulative[..., None, :] < ranks[..., None]).sum(axis=-1)
+        return np.where(totals > 0, bucket_value(index), np.nan)
+
+    def quantiles(self, pollutant, quantiles=TILE_QUANTILES, station=None, start=None,
+                  end=None, annual_periods=None):
+        """Quantiles of the hourly readings of one station, or of all
+        stations, on the selected days."""
+        mask = self.grid.mask(start, end, annual_periods)
+        histogram = self._histograms(self._cumulative(pollutant, station), mask)
+        return pd.Series(self._read(histogram, quantiles), index=quantiles)
+
+    def station_quantiles(self, pollutant, quantile, start=None, end=None,
+                          annual_periods=None):
+        """One quantile of the hourly readings of every station on the
+        selected days; NaN for stations without readings."""
+        mask = self.grid.mask(start, end, annual_periods)
+        histograms = self._histograms(self.cumulative[pollutant], mask)
+        values = self._read(histograms, [quantile])
+        return pd.Series(values[:, 0], index=pd.Index(self.stations, name="station"))
+
+    def resample(self, period, pollutant, quantiles=BAND_QUANTILES, station=None,
+                 start=None, end=None, annual_periods=None):
+        """Quantiles of each ``period`` bucket, labelled as
+        ``DailyRollup.resample`` labels them."""
+        mask = self.grid.mask(start, end, annual_periods)
+        daily = np.diff(self._cumulative(pollutant, station), axis=0)
+        present = np.flatnonzero(mask & (daily.sum(axis=1) > 0))
+        if len(present) == 0:
+            return pd.DataFrame(columns=quantiles, index=pd.DatetimeIndex([], name="date_time"),
+                                dtype=float)
+        first, last = present[0], present[-1] + 1
+        periods = pd.Series(1, index=self.days[first:last]).resample(period).count()
+        starts = np.concatenate([[0], np.cumsum(periods.to_numpy())[:-1]])
+        selected = np.where(mask[first:last, None], daily[first:last], 0)
+        histograms = np.add.reduceat(selected, starts, axis=0)
+        values = self._read(histograms, quantiles)
+        return pd.DataFrame(values, columns=quantiles,
+                            index=periods.index.rename("date_time"))
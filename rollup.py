@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+from grid import StationGrid
+
+POLLUTANTS = ["PM2.5", "PM10", "SO2", "NO2", "CO"]
+
+
+class DailyRollup:
+    """Per-station, per-day sum/count/min/max of each pollutant.
+
+    Tables are dense ``(station, day)`` arrays, so any D/W/M/Q/6M request is
+    answered by reducing day columns into resample buckets instead of
+    rescanning the hourly rows.
+    """
+
+    def __init__(self, grid, rows, tables):
+        self.grid = grid
+        self.days = grid.times
+        self.stations = grid.stations
+        self.station_index = grid.station_index
+        self.rows = rows
+        self.tables = tables
+        self.totals = {"rows": rows.sum(axis=0)}
+        for (pollutant, stat), table in tables.items():
+            if stat == "min":
+                total = table.min(axis=0, initial=np.inf)
+            elif stat == "max":
+                total = table.max(axis=0, initial=-np.inf)
+            else:
+                total = table.sum(axis=0)
+            self.totals[(pollutant, stat)] = total
+
+    @classmethod
+    def from_frame(cls, df, pollutants=POLLUTANTS):
+        grid, station_codes, day_codes = StationGrid.from_frame(df)
+        cells = station_codes * len(grid.times) + day_codes
+        shape = grid.shape
+        size = shape[0] * shape[1]
+
+        rows = np.bincount(cells, minlength=size).reshape(shape)
+        tables = {}
+        for pollutant in pollutants:
+            values = df[pollutant].to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            valid_cells = cells[valid]
+            valid_values = values[valid]
+            tables[(pollutant, "sum")] = np.bincount(
+                valid_cells, valid_values, minlength=size).reshape(shape)
+            tables[(pollutant, "count")] = np.bincount(
+                valid_cells, minlength=size).reshape(shape)
+            mins = np.full(size, np.inf)
+            np.minimum.at(mins, valid_cells, valid_values)
+            tables[(pollutant, "min")] = mins.reshape(shape)
+            maxs = np.full(size, -np.inf)
+            np.maximum.at(maxs, valid_cells, valid_values)
+            tables[(pollutant, "max")] = maxs.reshape(shape)
+        return cls(grid, rows, tables)
+
+    @classmethod
+    def from_parts(cls, grid, parts, pollutants=POLLUTANTS):
+        """Rollup on ``grid`` over the rows of every rollup in ``parts``.
+        Cells present in several parts are combined."""
+        rows = np.zeros(grid.shape, dtype=np.int64)
+        tables = {}
+        for pollutant in pollutants:
+            tables[(pollutant, "sum")] = np.zeros(grid.shape)
+            tables[(pollutant, "count")] = np.zeros(grid.shape, dtype=np.int64)
+            tables[(pollutant, "min")] = np.full(grid.shape, np.inf)
+            tables[(pollutant, "max")] = np.full(grid.shape, -np.inf)
+        for part in parts:
+            cells = grid.include(part.grid)
+            rows[cells] += part.rows
+            for key, table in tables.items():
+                if key[1] == "min":
+                    table[cells] = np.minimum(table[cells], part.tables[key])
+                elif key[1] == "max":
+                    table[cells] = np.maximum(table[cells], part.tables[key])
+                else:
+                    table[cells] += part.tables[key]
+        return cls(grid, rows, tables)
+
+    @classmethod
+    def from_chunks(cls, chunks, catalog, pollutants=POLLUTANTS):
+        """Rollup of chunked rows, allocated once over the catalog's stations
+        and days; every chunk adds into its own cells."""
+        return cls.from_parts(StationGrid.from_catalog(catalog),
+                              (cls.from_frame(chunk, pollutants) for chunk in chunks if len(chunk)),
+                              pollutants)
+
+    def _pollutants(self):
+        return list(dict.fromkeys(pollutant for pollutant, _ in self.tables))
+
+    def merge(self, other):
+        """Rollup over the rows of both rollups, on the union of their days
+        and stations."""
+        return DailyRollup.from_parts(self.grid.union(other.grid), [self, other],
+                                      self._pollutants())
+
+    def append(self, delta, df):
+        return self.merge(DailyRollup.from_frame(delta, self._pollutants()))
+
+    def station_means(self, pollutants=POLLUTANTS, start=None, end=None, annual_periods=None):
+        """Mean of each pollutant per station over the selected days; NaN
+        for stations without readings."""
+        mask = self.grid.mask(start, end, annual_periods)
+        means = {}
+        for pollutant in pollutants:
+            sums = self.tables[(pollutant, "sum")][:, mask].sum(axis=1)
+            counts = self.tables[(pollutant, "count")][:, mask].sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means[pollutant] = np.where(counts > 0, sums / counts, np.nan)
+        return pd.DataFrame(means, index=pd.Index(self.stations, name="station"))
+
+    def _select(self, key, station):
+        if station is None:
+            return self.totals[key]
+        table = self.rows if key == "rows" else self.tables[key]
+        return table[self.station_index[station]]
+
+    def resample(self, period, pollutants=POLLUTANTS, stat="mean", station=None,
+                 start=None, end=None, annual_periods=None):
+        """Equivalent of ``df.resample(period, on="date_time").agg(stat)``
+        over the hourly rows matching the given station and date filters."""
+        mask = self.grid.mask(start, end, annual_periods)
+        present = np.flatnonzero(mask & (self._select("rows", station) > 0))
+        if len(present) == 0:
+            return pd.DataFrame(
+                columns=pollutants, index=pd.DatetimeIndex([], name="date_time"),
+                dtype=float)
+
+        first, last = present[0], present[-1] + 1
+        span_mask = mask[first:last]
+        buckets = pd.Series(1, index=self.days[first:last]).resample(period).count()
+        starts = np.concatenate([[0], np.cumsum(buckets.to_numpy())[:-1]])
+
+        result = {}
+        for pollutant in pollutants:
+            if stat == "mean":
+                sums = self._reduce(pollutant, "sum", station, first, last, span_mask, starts)
+                counts = self._reduce(pollutant, "count", station, first, last, span_mask, starts)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    result[pollutant] = np.where(counts > 0, sums / counts, np.nan)
+            elif stat in ("min", "max"):
+                values = self._reduce(pollutant, stat, station, first, last, span_mask, starts)
+                result[pollutant] = np.where(np.isfinite(values), values, np.nan)
+            else:
+                result[pollutant] = self._reduce(pollutant, stat, station, first, last, span_mask, starts)
+        return pd.DataFrame(result, index=buckets.index.rename("date_time"))
+
+    def _reduce(self, pollutant, stat, station, first, last, span_mask, starts):
+        values = self._select((pollutant, stat), station)[first:last]
+        if stat == "min":
+            return np.minimum.reduceat(np.where(span_mask, values, np.inf), starts)
+        if stat == "max":
+            return np.maximum.reduceat(np.where(span_mask, values, -np.inf), starts)
+        return np.add.reduceat(np.where(span_mask, values, 0), starts)
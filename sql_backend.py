@@ -0,0 +1,304 @@
+"""SQLite query backend with filter and aggregation pushdown.
+
+The source is converted once into ``main_data.sqlite`` next to it, tagged
+with the source fingerprint. Sidebar filters become ``WHERE`` clauses and
+the dashboard's aggregations become ``GROUP BY`` queries, so only the small
+result frames reach pandas. ``SqlBackend`` stands in for the daily rollup
+(``resample``) and ``SqlSelection`` for the rows of one selection, so the
+analytics ``create_*`` functions run unchanged on top of it.
+"""
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import loader
+from aqi import CATEGORY_COLUMNS, SCALES
+from catalog import DatasetCatalog
+from memo import AggregateCache
+from rollup import POLLUTANTS
+from streaming import iter_chunks
+from weekday_profile import HOURS, WEEKDAYS, WeekdayHourProfile
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DAY_FORMAT = "%Y-%m-%d"
+SQL_STATS = {"min": "MIN", "max": "MAX", "mean": "AVG"}
+
+# Same shape as loader._loaded: absolute source path to (fingerprint,
+# backend, derived structures).
+_loaded = {}
+
+
+def database_path(path):
+    return os.path.splitext(path)[0] + ".sqlite"
+
+
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def build_database(path, db_path, fingerprint):
+    """Convert the source into a SQLite table with (station, date_time) and
+    date_time indexes, written to a temporary file and moved into place."""
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        for chunk in iter_chunks(path):
+            times = chunk["date_time"].dt
+            chunk = chunk.assign(
+                date_time=times.strftime(TIME_FORMAT),
+                day=times.strftime(DAY_FORMAT),
+                weekday=(times.dayofweek + 1) % 7,
+                hour_of_day=times.hour,
+                annually_period=chunk["annually_period"].astype(str),
+            )
+            chunk = chunk.drop(columns=[column for column in CATEGORY_COLUMNS if column in chunk])
+            chunk.to_sql("readings", connection, if_exists="append", index=False)
+        connection.execute("CREATE INDEX readings_station_time ON readings (station, date_time)")
+        connection.execute("CREATE INDEX readings_time ON readings (date_time)")
+        connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        connection.execute("INSERT INTO meta VALUES ('source_fingerprint', ?)", (fingerprint,))
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, db_path)
+
+
+def database_fingerprint(db_path):
+    if not os.path.exists(db_path):
+        return None
+    try:
+        connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            row = connection.execute(
+                "SELECT value FROM meta WHERE key = 'source_fingerprint'").fetchone()
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def category_case(pollutant):
+    """SQL expression for ``AqiScale.codes`` of one pollutant."""
+    scale = SCALES[pollutant]
+    branches = " ".join(
+        f"WHEN {quote(pollutant)} <= {float(high)!r} THEN {code}"
+        for high, code in zip(scale.high[:-1], scale.segment_codes[:-1]))
+    return (f"CASE WHEN {quote(pollutant)} IS NULL THEN NULL {branches} "
+            f"ELSE {scale.segment_codes[-1]} END")
+
+
+def where_clause(station=None, start=None, end=None, annual_periods=None, days=False):
+    """``WHERE`` clause and parameters for ``DatasetIndex.select`` filters.
+
+    With ``days=True``, ``start``/``end`` are inclusive calendar days as in
+    ``DailyRollup.resample``; otherwise ``end`` is an exclusive timestamp.
+    """
+    conditions = []
+    params = []
+    if station is not None:
+        conditions.append("station = ?")
+        params.append(station)
+    if days:
+        if start is not None:
+            conditions.append("day >= ?")
+            params.append(pd.Timestamp(start).strftime(DAY_FORMAT))
+        if end is not None:
+            conditions.append("day <= ?")
+            params.append(pd.Timestamp(end).strftime(DAY_FORMAT))
+    else:
+        if start is not None:
+            conditions.append("date_time >= ?")
+            params.append(pd.Timestamp(start).strftime(TIME_FORMAT))
+        if end is not None:
+            conditions.append("date_time < ?")
+            params.append(pd.Timestamp(end).strftime(TIME_FORMAT))
+    if annual_periods is not None:
+        conditions.append(f"annually_period IN ({', '.join('?' * len(annual_periods))})")
+        params.extend(annual_periods)
+    if not conditions:
+        return "", params
+    return "WHERE " + " AND ".join(conditions), params
+
+
+class SqlBackend:
+    """Read-only queries over one converted source, one connection per thread."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._daily = AggregateCache(maxsize=64)
+        self.catalog = self._catalog()
+
+    def query(self, sql, params=()):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True,
+                                         check_same_thread=False)
+            self._local.connection = connection
+        return pd.read_sql_query(sql, connection, params=list(params))
+
+    def _catalog(self):
+        stations = self.query(
+            "SELECT station, COUNT(*) AS rows FROM readings GROUP BY station ORDER BY station")
+        periods = self.query(
+            "SELECT annually_period, MIN(date_time) AS first, MAX(date_time) AS last, "
+            "COUNT(*) AS rows FROM readings GROUP BY annually_period ORDER BY annually_period")
+        period_bounds = {
+            row.annually_period: (pd.Timestamp(row.first), pd.Timestamp(row.last))
+            for row in periods.itertuples()
+        }
+        return DatasetCatalog(
+            stations=stations["station"].tolist(),
+            annual_periods=periods["annually_period"].tolist(),
+            period_bounds=period_bounds,
+            min_date=min(first for first, _ in period_bounds.values()),
+            max_date=max(last for _, last in period_bounds.values()),
+            station_rows=dict(zip(stations["station"], stations["rows"].tolist())),
+            period_rows=dict(zip(periods["annually_period"], periods["rows"].tolist())),
+        )
+
+    def select(self, station=None, start=None, end=None, annual_periods=None):
+        return SqlSelection(self, station=station, start=start, end=end,
+                            annual_periods=annual_periods)
+
+    def daily(self, pollutants, station=None, start=None, end=None, annual_periods=None):
+        """Per-day sum/count/min/max of each pollutant, for days with rows."""
+        key = (tuple(pollutants), station, start, end,
+               None if annual_periods is None else tuple(annual_periods))
+        return self._daily.get_or_compute(
+            key, self._query_daily, pollutants, station, start, end, annual_periods)
+
+    def _query_daily(self, pollutants, station, start, end, annual_periods):
+        where, params = where_clause(station, start, end, annual_periods, days=True)
+        columns = ", ".join(
+            f"SUM({quote(p)}) AS {quote(p + ':sum')}, COUNT({quote(p)}) AS {quote(p + ':count')}, "
+            f"MIN({quote(p)}) AS {quote(p + ':min')}, MAX({quote(p)}) AS {quote(p + ':max')}"
+            for p in pollutants)
+        daily = self.query(
+            f"SELECT day, {columns} FROM readings {where} GROUP BY day ORDER BY day", params)
+        daily.index = pd.DatetimeIndex(
+            pd.to_datetime(daily.pop("day"), format=DAY_FORMAT), name="date_time")
+        return daily
+
+    def resample(self, period, pollutants=POLLUTANTS, stat="mean", station=None,
+                 start=None, end=None, annual_periods=None):
+        """Same frame as ``DailyRollup.resample``: days are aggregated in
+        SQL and only the per-day partials are bucketed in pandas."""
+        daily = self.daily(pollutants, station, start, end, annual_periods)
+        if len(daily) == 0:
+            return pd.DataFrame(
+                columns=pollutants, index=pd.DatetimeIndex([], name="date_time"),
+                dtype=float)
+        result = {}
+        for pollutant in pollutants:
+            if stat == "mean":
+                sums = daily[pollutant + ":sum"].fillna(0).resample(period).sum()
+                counts = daily[pollutant + ":count"].resample(period).sum()
+                result[pollutant] = sums / counts.where(counts > 0)
+            else:
+                values = daily[f"{pollutant}:{stat}"].astype(float).resample(period)
+                result[pollutant] = getattr(values, stat)()
+        return pd.DataFrame(result).rename_axis("date_time")
+
+    def station_means(self, pollutants=POLLUTANTS, start=None, end=None, annual_periods=None):
+        """Same frame as ``DailyRollup.station_means``."""
+        where, params = where_clause(None, start, end, annual_periods, days=True)
+        columns = ", ".join(f"AVG({quote(p)}) AS {quote(p)}" for p in pollutants)
+        means = self.query(
+            f"SELECT station, {columns} FROM readings {where} GROUP BY station", params)
+        means = means.set_index("station").astype(float)
+        return means.reindex(pd.Index(self.catalog.stations, name="station"))
+
+
+class SqlSelection:
+    """The rows of one sidebar selection, answered with pushed-down queries."""
+
+    def __init__(self, backend, **filters):
+        self.backend = backend
+        self.filters = filters
+        self.where, self.params = where_clause(**filters)
+        self.length = int(self.backend.query(
+            f"SELECT COUNT(*) AS rows FROM readings {self.where}", self.params)["rows"][0])
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def empty(self):
+        return self.length == 0
+
+    def group_agg(self, key, spec):
+        """Same frame as ``df.groupby(key).agg(spec)`` for min/max/mean."""
+        expressions = []
+        names = []
+        for pollutant, stats in spec.items():
+            for stat in [stats] if isinstance(stats, str) else stats:
+                expressions.append(f"{SQL_STATS[stat]}({quote(pollutant)})")
+                names.append(pollutant if isinstance(stats, str) else (pollutant, stat))
+        result = self.backend.query(
+            f"SELECT {key}, {', '.join(expressions)} FROM readings {self.where} "
+            f"GROUP BY {key} ORDER BY {key}", self.params)
+        index = result.iloc[:, 0]
+        if key == "date_time":
+            index = pd.to_datetime(index, format=TIME_FORMAT)
+        values = result.iloc[:, 1:].astype(float).to_numpy()
+        columns = pd.MultiIndex.from_tuples(names) if isinstance(names[0], tuple) else names
+        return pd.DataFrame(values, index=pd.Index(index, name=key), columns=columns)
+
+    def nunique(self, column):
+        """Distinct ``idx`` per AQI category, categories computed in SQL."""
+        pollutant = CATEGORY_COLUMNS[column]
+        result = self.backend.query(
+            f"SELECT {category_case(pollutant)} AS code, COUNT(DISTINCT idx) AS idx "
+            f"FROM readings {self.where} GROUP BY code HAVING code IS NOT NULL ORDER BY code",
+            self.params)
+        categories = np.asarray(SCALES[pollutant].categories, dtype=object)
+        return pd.Series(result["idx"].to_numpy(), name="idx",
+                         index=pd.Index(categories[result["code"].to_numpy(dtype=int)],
+                                        name=column))
+
+    @property
+    def profile(self):
+        columns = ", ".join(
+            f"SUM({quote(p)}) AS {quote(p + ':sum')}, COUNT({quote(p)}) AS {quote(p + ':count')}"
+            for p in POLLUTANTS)
+        result = self.backend.query(
+            f"SELECT weekday, hour_of_day, COUNT(*) AS rows, {columns} FROM readings "
+            f"{self.where} GROUP BY weekday, hour_of_day", self.params)
+        cells = (result["weekday"] * HOURS + result["hour_of_day"]).to_numpy()
+        shape = (len(WEEKDAYS), HOURS)
+
+        def grid(values):
+            table = np.zeros(shape[0] * shape[1], dtype=values.dtype)
+            table[cells] = values
+            return table.reshape(shape)
+
+        return WeekdayHourProfile(
+            grid(result["rows"].to_numpy()),
+            {p: grid(result[p + ":sum"].fillna(0).to_numpy(dtype=float)) for p in POLLUTANTS},
+            {p: grid(result[p + ":count"].to_numpy()) for p in POLLUTANTS},
+        )
+
+
+def load_backend(path="main_data.csv"):
+    """Backend over the converted source, rebuilt when the source changes."""
+    path = os.path.abspath(path)
+    fingerprint = loader.source_fingerprint(path)
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != fingerprint:
+        db_path = database_path(path)
+        if database_fingerprint(db_path) != fingerprint:
+            build_database(path, db_path, fingerprint)
+        cached = (fingerprint, SqlBackend(db_path), {})
+        _loaded[path] = cached
+    return cached[1]
+
+
+def load_derived(name, build, path="main_data.csv"):
+    return loader.cached_derived(_loaded, load_backend, name, build, path)
@@ -0,0 +1,223 @@
+"""Out-of-core aggregation for sources that do not fit in memory.
+
+The source is read in chunks and every chunk is folded into partial
+aggregates: sum/count/min/max grouped by timestamp and station, the weekday
+x hour profile and the AQI category bitmaps. A first pass reads the
+catalog, which sizes the grouped partials, so each chunk adds into them in
+place. Peak memory is one chunk plus the partials, whose size depends on
+the number of stations and hours, not on the number of rows.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import loader
+from catalog import DatasetCatalog
+from category_counts import CategoryCounts
+from memo import AggregateCache
+from rollup import POLLUTANTS
+from weekday_profile import WeekdayHourProfile
+
+DEFAULT_CHUNK_ROWS = 100_000
+GROUP_KEYS = ["date_time", "station"]
+
+# Same shape as loader._loaded: absolute source path to (fingerprint,
+# partials of every row, derived structures).
+_loaded = {}
+
+
+def iter_chunks(path="main_data.csv", chunksize=DEFAULT_CHUNK_ROWS):
+    """Chunks of the source rows, from the Parquet copy when it is current."""
+    parquet_path = loader.columnar_path(path)
+    if loader.columnar_is_current(parquet_path, loader.source_fingerprint(path)):
+        parquet = loader.pq.ParquetFile(parquet_path)
+        for batch in parquet.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+        return
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        chunk["date_time"] = pd.to_datetime(chunk["date_time"])
+        loader.check_category_columns(chunk, path)
+        yield chunk
+
+
+def filter_rows(chunk, station=None, start=None, end=None, annual_periods=None):
+    """Rows of one chunk matching ``DatasetIndex.select`` arguments."""
+    mask = np.ones(len(chunk), dtype=bool)
+    if station is not None:
+        mask &= (chunk["station"] == station).to_numpy()
+    if start is not None:
+        mask &= (chunk["date_time"] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (chunk["date_time"] < pd.Timestamp(end)).to_numpy()
+    if annual_periods is not None:
+        mask &= chunk["annually_period"].astype(str).isin(annual_periods).to_numpy()
+    return chunk if mask.all() else chunk[mask]
+
+
+class GroupPartial:
+    """sum/count/min/max of each pollutant per value of one key column.
+
+    The arrays span every key value of the catalog, the stations or every
+    hour from the first reading to the last, so each chunk adds into them
+    in place at the cost of its own rows. ``trimmed`` keeps the values
+    that have rows once all chunks are in.
+    """
+
+    def __init__(self, keys, rows, stats):
+        self.keys = keys
+        self.rows = rows
+        # (pollutant, stat) -> array over keys.
+        self.stats = stats
+
+    @classmethod
+    def from_catalog(cls, catalog, key, pollutants=POLLUTANTS):
+        if key == "station":
+            keys = pd.Index(catalog.stations, name=key)
+        else:
+            keys = pd.date_range(catalog.min_date, catalog.max_date, freq="h", name=key)
+        stats = {}
+        for pollutant in pollutants:
+            stats[(pollutant, "sum")] = np.zeros(len(keys))
+            stats[(pollutant, "count")] = np.zeros(len(keys), dtype=np.int64)
+            stats[(pollutant, "min")] = np.full(len(keys), np.inf)
+            stats[(pollutant, "max")] = np.full(len(keys), -np.inf)
+        return cls(keys, np.zeros(len(keys), dtype=np.int64), stats)
+
+    def add(self, df):
+        codes = self.keys.get_indexer(df[self.keys.name])
+        if (codes < 0).any():
+            raise ValueError(f"{self.keys.name} values outside the catalog")
+        size = len(self.keys)
+        self.rows += np.bincount(codes, minlength=size)
+        for pollutant in dict.fromkeys(pollutant for pollutant, _ in self.stats):
+            values = df[pollutant].to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            cells, values = codes[valid], values[valid]
+            self.stats[(pollutant, "sum")] += np.bincount(cells, values, minlength=size)
+            self.stats[(pollutant, "count")] += np.bincount(cells, minlength=size)
+            np.minimum.at(self.stats[(pollutant, "min")], cells, values)
+            np.maximum.at(self.stats[(pollutant, "max")], cells, values)
+
+    def trimmed(self):
+        present = self.rows > 0
+        return GroupPartial(self.keys[present], self.rows[present],
+                            {column: values[present] for column, values in self.stats.items()})
+
+    def agg(self, spec):
+        """Same frame as ``df.groupby(key).agg(spec)`` for min/max/mean."""
+        present = self.rows > 0
+        columns = {}
+        for pollutant, stats in spec.items():
+            counts = self.stats[(pollutant, "count")][present]
+            for stat in [stats] if isinstance(stats, str) else stats:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    if stat == "mean":
+                        values = self.stats[(pollutant, "sum")][present] / counts
+                    else:
+                        values = self.stats[(pollutant, stat)][present]
+                values = np.where(counts > 0, values, np.nan)
+                columns[pollutant if isinstance(stats, str) else (pollutant, stat)] = values
+        return pd.DataFrame(columns, index=self.keys[present])
+
+
+class StreamingAggregates:
+    """Partials standing in for the rows of one selection.
+
+    The analytics ``create_*`` functions accept it in place of a frame.
+    ``catalog`` spans the whole dataset and sizes the group partials.
+    """
+
+    def __init__(self, rows, groups, profile, counts, catalog):
+        self.rows = rows
+        self.groups = groups
+        self.profile = profile
+        self.counts = counts
+        self.catalog = catalog
+
+    @classmethod
+    def from_frame(cls, df, catalog):
+        groups = {key: GroupPartial.from_catalog(catalog, key) for key in GROUP_KEYS}
+        for group in groups.values():
+            group.add(df)
+        return cls(
+            rows=len(df),
+            groups=groups,
+            profile=WeekdayHourProfile.from_frame(df),
+            counts=CategoryCounts.from_frame(df),
+            catalog=catalog,
+        )
+
+    def add(self, df):
+        """Fold the rows of ``df`` in, in place."""
+        self.rows += len(df)
+        for group in self.groups.values():
+            group.add(df)
+        self.profile = self.profile.merge(WeekdayHourProfile.from_frame(df))
+        self.counts = self.counts.merge(CategoryCounts.from_frame(df))
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def empty(self):
+        return self.rows == 0
+
+    def group_agg(self, key, spec):
+        return self.groups[key].agg(spec)
+
+    def nunique(self, column):
+        return self.counts.nunique(column)
+
+
+def scan_catalog(chunks):
+    """Catalog of chunked rows."""
+    catalog = None
+    for chunk in chunks:
+        part = DatasetCatalog.from_frame(chunk)
+        catalog = part if catalog is None else catalog.merge(part)
+    return catalog
+
+
+def aggregate_chunks(chunks, catalog, **row_filter):
+    partials = None
+    for chunk in chunks:
+        chunk = filter_rows(chunk, **row_filter)
+        if partials is None:
+            partials = StreamingAggregates.from_frame(chunk, catalog)
+        elif len(chunk):
+            partials.add(chunk)
+    partials.groups = {key: group.trimmed() for key, group in partials.groups.items()}
+    return partials
+
+
+def load_partials(path="main_data.csv", chunksize=DEFAULT_CHUNK_ROWS):
+    """Partials of every row, cached until the source changes."""
+    path = os.path.abspath(path)
+    fingerprint = loader.source_fingerprint(path)
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != fingerprint:
+        catalog = scan_catalog(iter_chunks(path, chunksize))
+        partials = aggregate_chunks(iter_chunks(path, chunksize), catalog)
+        cached = (fingerprint, partials, {})
+        _loaded[path] = cached
+    return cached[1]
+
+
+def load_derived(name, build, path="main_data.csv"):
+    return loader.cached_derived(_loaded, load_partials, name, build, path)
+
+
+def select_partials(path="main_data.csv", station=None, start=None, end=None,
+                    annual_periods=None):
+    """Partials of the rows ``DatasetIndex.select`` would return, from one
+    filtered pass over the source. Recent selections are cached."""
+    if station is None and start is None and end is None and annual_periods is None:
+        return load_partials(path)
+    scans = load_derived("selections", lambda partials: AggregateCache(maxsize=32), path)
+    key = (station, start, end, None if annual_periods is None else tuple(annual_periods))
+    catalog = load_partials(path).catalog
+    return scans.get_or_compute(
+        key, lambda: aggregate_chunks(
+            iter_chunks(path), catalog, station=station, start=start, end=end,
+            annual_periods=annual_periods))
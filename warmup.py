@@ -0,0 +1,241 @@
+"""Background warm-up of the dashboard's aggregate cache.
+
+Every district x period-mode combination is computed in a process pool:
+all districts and each single station, crossed with the whole period, the
+default date range and every single annual period. Results are stored in
+the process-wide ``AggregateCache`` under the keys the dashboard's
+``memo`` uses, so the first visitor to pick a combination is served from
+cache. Run ``python warmup.py`` to time a warm-up without the dashboard.
+"""
+import argparse
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+import loader
+from analytics import (
+    create_avg_aqi_df,
+    create_aqi_stats_df,
+    create_rolling_aqi_df,
+    create_exceedance_df,
+    create_percentile_df,
+    create_percentile_band_df,
+    create_monthly_per_year_avg_aqi_df,
+    create_station_scores_df,
+    create_leaderboard_df,
+    create_daily_avg_aqi_df,
+    create_hourly_avg_aqi_df,
+    create_weekday_hour_profile,
+    create_weekday_hour_df,
+    create_aqi_by_pm2_5_df,
+    create_aqi_by_pm10_df,
+    create_agg_df,
+    create_agg_stats_df,
+    create_correlation_df,
+)
+from catalog import DatasetCatalog
+from correlation import CovarianceRollup
+from dataset_index import DatasetIndex
+from disk_cache import MISSING
+from leaderboard import LEADERBOARD_SIZE, RANKINGS, StationLeaderboard
+from memo import AggregateCache, disk_store, selection_key
+from quantiles import QuantileSketches
+from rolling import ROLLING_POLLUTANTS, RollingAqi
+from rollup import POLLUTANTS, DailyRollup
+
+AVG_AQI_PERIODS = ["D", "M", "Q", "6M"]
+AGG_PERIODS = ["W", "M", "Q", "6M"]
+
+# Loaded once per worker process by _load_worker.
+_worker = {}
+
+
+def combinations(catalog):
+    """(selection, row_filter, annual_periods) for every district and
+    period mode the sidebar offers without a custom date range."""
+    first_day, last_day = catalog.min_date.date(), catalog.max_date.date()
+    modes = [
+        ({}, {}, ["", ""]),
+        ({"start": first_day, "end": last_day},
+         {"start": first_day, "end": last_day + timedelta(days=1)}, ["", ""]),
+    ]
+    modes += [({"annual_periods": [label]}, {"annual_periods": [label]}, [label])
+              for label in catalog.annual_periods]
+    result = []
+    for station in [None] + catalog.stations:
+        for selection, row_filter, annual_periods in modes:
+            if station is not None:
+                selection = {**selection, "station": station}
+                row_filter = {**row_filter, "station": station}
+            result.append((selection, row_filter, annual_periods))
+    return result
+
+
+def page_aggregates(main_df, rollup, rolling, sketches, covariance, selection,
+                    annual_periods):
+    """Every aggregate the dashboard memoizes for one selection, keyed as
+    ``memo`` keys them."""
+    filter_key = selection_key(selection)
+    results = {}
+
+    def add(create, *args, params=()):
+        value = create(*args)
+        results[(create.__name__, filter_key) + params] = value
+        return value
+
+    add(create_aqi_stats_df, main_df)
+    add(create_agg_stats_df, main_df)
+    add(create_percentile_df, sketches, selection)
+    add(create_exceedance_df, rolling, selection)
+    if main_df.empty:
+        return results
+    for pollutant in ROLLING_POLLUTANTS:
+        add(create_rolling_aqi_df, rolling, selection, pollutant, params=(pollutant,))
+    for period in AVG_AQI_PERIODS:
+        add(create_avg_aqi_df, rollup, selection, period, params=(period,))
+        add(create_percentile_band_df, sketches, selection, period, params=(period,))
+    if len(annual_periods) < 2:
+        add(create_monthly_per_year_avg_aqi_df, rollup, selection)
+    leaderboard = StationLeaderboard(rollup, sketches, rolling)
+    for ranking in RANKINGS:
+        scores_df = add(create_station_scores_df, leaderboard, selection, ranking,
+                        params=(ranking,))
+        add(create_leaderboard_df, scores_df, LEADERBOARD_SIZE,
+            params=(ranking, LEADERBOARD_SIZE))
+    profile = add(create_weekday_hour_profile, main_df)
+    add(create_daily_avg_aqi_df, profile)
+    add(create_hourly_avg_aqi_df, profile)
+    for pollutant in POLLUTANTS:
+        add(create_weekday_hour_df, profile, pollutant, params=(pollutant,))
+    add(create_aqi_by_pm2_5_df, main_df)
+    add(create_aqi_by_pm10_df, main_df)
+    for period in AGG_PERIODS:
+        add(create_agg_df, rollup, selection, period, annual_periods, params=(period,))
+    add(create_correlation_df, covariance, selection)
+    return results
+
+
+def warmed_key(combination):
+    """Disk-store key marking a combination whose aggregates were stored;
+    its value lists their keys."""
+    return ("cache_warmup", selection_key(combination[0]))
+
+
+def is_warmed(store, combination):
+    """Whether ``store`` has the marker of ``combination`` and every
+    aggregate it lists: LRU eviction may have dropped some since."""
+    keys = store.get(warmed_key(combination))
+    return keys is not MISSING and all(key in store for key in keys)
+
+
+def _load_worker(path):
+    loader.load_main_data(path)
+    _worker["index"] = loader.load_derived("dataset_index", DatasetIndex.from_frame, path)
+    _worker["rollup"] = loader.load_derived("daily_rollup", DailyRollup.from_frame, path)
+    _worker["rolling"] = loader.load_derived("rolling_aqi", RollingAqi.from_frame, path)
+    _worker["sketches"] = loader.load_derived(
+        "quantile_sketches", QuantileSketches.from_frame, path)
+    _worker["covariance"] = loader.load_derived("covariance", CovarianceRollup.from_frame, path)
+
+
+def _warm(selection, row_filter, annual_periods):
+    main_df = _worker["index"].select(**row_filter)
+    return list(page_aggregates(main_df, _worker["rollup"], _worker["rolling"],
+                                _worker["sketches"], _worker["covariance"], selection,
+                                annual_periods).items())
+
+
+class CacheWarmup:
+    """Fills ``cache`` from a process pool on a background thread.
+
+    ``done``/``total`` report progress while it runs; ``elapsed`` is the
+    total warm-up time once ``finished``. When the cache has a disk store,
+    combinations whose aggregates an earlier run on the same data stored,
+    and which are all still on disk, are skipped and counted in
+    ``reused``: their aggregates are read from disk on demand.
+    """
+
+    def __init__(self, cache, combinations, path="main_data.csv", max_workers=None):
+        self.cache = cache
+        self.combinations = combinations
+        self.path = path
+        self.max_workers = max_workers
+        self.total = len(combinations)
+        self.done = 0
+        self.aggregates = 0
+        self.reused = 0
+        self.errors = []
+        self.elapsed = None
+        self.finished = False
+
+    def start(self):
+        threading.Thread(target=self.run, name="cache-warmup", daemon=True).start()
+        return self
+
+    def run(self, on_progress=None):
+        start = time.perf_counter()
+        store = self.cache.store
+        pending = [combination for combination in self.combinations
+                   if store is None or not is_warmed(store, combination)]
+        self.reused = self.done = len(self.combinations) - len(pending)
+        # Workers are spawned, not forked: the server process has threads.
+        context = multiprocessing.get_context("spawn")
+        try:
+            if not pending:
+                return self
+            with ProcessPoolExecutor(self.max_workers, mp_context=context,
+                                     initializer=_load_worker,
+                                     initargs=(self.path,)) as pool:
+                futures = {pool.submit(_warm, *combination): combination
+                           for combination in pending}
+                for future in as_completed(futures):
+                    try:
+                        items = future.result()
+                    except Exception as error:
+                        self.errors.append(repr(error))
+                        continue
+                    for key, value in items:
+                        self.cache.put(key, value)
+                    if store is not None:
+                        store.put(warmed_key(futures[future]), [key for key, _ in items])
+                    self.aggregates += len(items)
+                    self.done += 1
+                    if on_progress is not None:
+                        on_progress(self)
+        except Exception as error:
+            self.errors.append(repr(error))
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self.finished = True
+        return self
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default="main_data.csv")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", metavar="DIR",
+                        help="also store the aggregates in the dashboard's disk cache, "
+                             "e.g. main_data.cache")
+    parser.add_argument("--cache-mb", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    catalog = loader.load_derived("catalog", DatasetCatalog.from_frame, args.path)
+    store = None
+    if args.cache_dir:
+        store = disk_store(args.cache_dir, loader.data_fingerprint(args.path), "pandas",
+                           args.cache_mb * 2**20)
+    cache = AggregateCache(maxsize=1_000_000, store=store)
+    warmup = CacheWarmup(cache, combinations(catalog), args.path, args.workers)
+    warmup.run(on_progress=lambda warmup: print(
+        f"{warmup.done}/{warmup.total} combinations, {warmup.aggregates} aggregates",
+        flush=True))
+    for error in warmup.errors:
+        print(f"error: {error}")
+    print(f"warm-up took {warmup.elapsed:.1f} s, {warmup.reused} combinations already on disk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from rollup import POLLUTANTS
+
+# Sunday first, as on the per-day chart.
+WEEKDAYS = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+HOURS = 24
+
+
+class WeekdayHourProfile:
+    """Per-pollutant sums and counts in a 7 x 24 weekday-by-hour grid.
+
+    Built in one pass: every reading's weekday and hour become one integer
+    cell code, and each pollutant is a single weighted ``bincount``. Per-day
+    and per-hour means are the row and column marginals; grids from
+    separate row batches merge by addition.
+    """
+
+    def __init__(self, rows, sums, counts):
+        self.rows = rows
+        self.sums = sums
+        self.counts = counts
+
+    @classmethod
+    def from_frame(cls, df, pollutants=POLLUTANTS):
+        times = df["date_time"].dt
+        # dayofweek counts from Monday; shift so Sunday is row 0.
+        cells = (((times.dayofweek.to_numpy() + 1) % 7) * HOURS
+                 + times.hour.to_numpy())
+        size = len(WEEKDAYS) * HOURS
+        shape = (len(WEEKDAYS), HOURS)
+        rows = np.bincount(cells, minlength=size).reshape(shape)
+        sums = {}
+        counts = {}
+        for pollutant in pollutants:
+            values = df[pollutant].to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            sums[pollutant] = np.bincount(
+                cells[valid], values[valid], minlength=size).reshape(shape)
+            counts[pollutant] = np.bincount(cells[valid], minlength=size).reshape(shape)
+        return cls(rows, sums, counts)
+
+    def merge(self, other):
+        return WeekdayHourProfile(
+            self.rows + other.rows,
+            {pollutant: sums + other.sums[pollutant] for pollutant, sums in self.sums.items()},
+            {pollutant: counts + other.counts[pollutant] for pollutant, counts in self.counts.items()},
+        )
+
+    def __len__(self):
+        return int(self.rows.sum())
+
+    def _means(self, pollutants, axis):
+        present = self.rows.sum(axis=axis) > 0
+        means = {}
+        for pollutant in pollutants:
+            sums = self.sums[pollutant] if axis is None else self.sums[pollutant].sum(axis=axis)
+            counts = self.counts[pollutant] if axis is None else self.counts[pollutant].sum(axis=axis)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means[pollutant] = np.where(counts > 0, sums / counts, np.nan)
+        return means, present
+
+    def weekday_means(self, pollutants):
+        """Mean of each pollutant per weekday, for weekdays with readings."""
+        means, present = self._means(pollutants, axis=1)
+        return pd.DataFrame(means, index=pd.Index(WEEKDAYS, name="day"))[present]
+
+    def hour_means(self, pollutants):
+        """Mean of each pollutant per hour of day, for hours with readings."""
+        means, present = self._means(pollutants, axis=0)
+        return pd.DataFrame(means, index=pd.RangeIndex(HOURS, name="hour"))[present]
+
+    def grid(self, pollutant):
+        """7 x 24 frame of means, weekdays as rows and hours as columns."""
+        means, _ = self._means([pollutant], axis=None)
+        return pd.DataFrame(means[pollutant], index=pd.Index(WEEKDAYS, name="day"),
+                            columns=pd.RangeIndex(HOURS, name="hour"))